@@ -4,6 +4,8 @@ Ensures balance sheet always balances by using aggregate totals
 """
 from lxml import etree
 from decimal import Decimal
+from collections import defaultdict
+from functools import lru_cache
 from typing import Dict, List, Tuple, Optional
 from pathlib import Path
 from datetime import datetime
@@ -16,6 +18,15 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Compiled once: selects every fact element (anything carrying a contextRef)
+_FACTS_XPATH = etree.XPath('//*[@contextRef]')
+
+
+@lru_cache(maxsize=None)
+def _local_name(tag: str) -> str:
+    """Local part of a '{namespace}Name' or 'prefix:Name' fact tag"""
+    return etree.QName(tag).localname if tag.startswith('{') else tag.split(':')[-1]
+
 
 class XBRLParseError(Exception):
     """Raised when XBRL parsing fails"""
@@ -87,6 +98,32 @@ class EnhancedXBRLParser:
             self.inc_mapping_v2 = {}
             self.aggregate_tags_reconciliation = {}
 
+        # Precompute priority entries once per field config
+        self._priority_entries = {}
+        for mapping in (self.bs_mapping_v2, self.inc_mapping_v2):
+            for field_config in mapping.values():
+                if isinstance(field_config, dict):
+                    self._priority_entries[id(field_config)] = self._compile_priorities(field_config)
+
+    PRIORITY_KEYS = ('priority_1', 'priority_2', 'priority_3', 'priority_4', 'priority_5')
+
+    @classmethod
+    def _compile_priorities(cls, field_config: Dict[str, str]) -> List[Tuple[str, str, bool]]:
+        """
+        Build (expected_local, xbrl_tag, needs_totale) entries for a field config
+
+        needs_totale is False when the priority tag is itself a 'Totale...' aggregate,
+        in which case only an exact local name match is meaningful.
+        """
+        entries = []
+        for priority_key in cls.PRIORITY_KEYS:
+            if priority_key not in field_config:
+                continue
+            xbrl_tag = field_config[priority_key]
+            expected_local = xbrl_tag.split(':')[-1]
+            entries.append((expected_local, xbrl_tag, not expected_local.startswith('Totale')))
+        return entries
+
     def clean_xbrl_text(self, text: str) -> str:
         """Clean special characters from XBRL text"""
         if not text:
@@ -173,50 +210,59 @@ class EnhancedXBRLParser:
         context_elements = root.findall('.//xbrli:context', namespaces=self.XBRL_NAMESPACES)
 
         for ctx in context_elements:
-            ctx_id = ctx.get('id')
-            if not ctx_id:
-                continue
+            context = self._parse_context(ctx)
+            if context is not None:
+                contexts[context['id']] = context
 
-            period = ctx.find('.//xbrli:period', namespaces=self.XBRL_NAMESPACES)
+        return contexts
 
-            if period is not None:
-                period_months = None
-                instant = period.find('.//xbrli:instant', namespaces=self.XBRL_NAMESPACES)
-                if instant is not None:
-                    date_str = instant.text
-                    try:
-                        date = datetime.strptime(date_str, '%Y-%m-%d')
-                        year = date.year
-                    except:
-                        year = None
-                else:
-                    start_date_el = period.find('.//xbrli:startDate', namespaces=self.XBRL_NAMESPACES)
-                    end_date = period.find('.//xbrli:endDate', namespaces=self.XBRL_NAMESPACES)
-                    if end_date is not None:
-                        date_str = end_date.text
-                        try:
-                            date = datetime.strptime(date_str, '%Y-%m-%d')
-                            year = date.year
-                            # Detect period_months from startDate..endDate
-                            if start_date_el is not None:
-                                start = datetime.strptime(start_date_el.text, '%Y-%m-%d')
-                                # Calculate months: Jan 1 to Jun 30 = 6 months, Jan 1 to Dec 31 = 12
-                                months = (date.year - start.year) * 12 + (date.month - start.month + 1)
-                                if months >= 1 and months <= 11:
-                                    period_months = months
-                        except:
-                            year = None
-                    else:
-                        year = None
-
-                contexts[ctx_id] = {
-                    'id': ctx_id,
-                    'year': year,
-                    'date': date_str if 'date_str' in locals() else None,
-                    'period_months': period_months,
-                }
+    def _parse_context(self, ctx: etree._Element) -> Optional[Dict]:
+        """Period information for a single xbrli:context element (None if it has no id/period)"""
+        ctx_id = ctx.get('id')
+        if not ctx_id:
+            return None
 
-        return contexts
+        period = ctx.find('.//xbrli:period', namespaces=self.XBRL_NAMESPACES)
+
+        if period is None:
+            return None
+
+        date_str = None
+        period_months = None
+        instant = period.find('.//xbrli:instant', namespaces=self.XBRL_NAMESPACES)
+        if instant is not None:
+            date_str = instant.text
+            try:
+                date = datetime.strptime(date_str, '%Y-%m-%d')
+                year = date.year
+            except:
+                year = None
+        else:
+            start_date_el = period.find('.//xbrli:startDate', namespaces=self.XBRL_NAMESPACES)
+            end_date = period.find('.//xbrli:endDate', namespaces=self.XBRL_NAMESPACES)
+            if end_date is not None:
+                date_str = end_date.text
+                try:
+                    date = datetime.strptime(date_str, '%Y-%m-%d')
+                    year = date.year
+                    # Detect period_months from startDate..endDate
+                    if start_date_el is not None:
+                        start = datetime.strptime(start_date_el.text, '%Y-%m-%d')
+                        # Calculate months: Jan 1 to Jun 30 = 6 months, Jan 1 to Dec 31 = 12
+                        months = (date.year - start.year) * 12 + (date.month - start.month + 1)
+                        if months >= 1 and months <= 11:
+                            period_months = months
+                except:
+                    year = None
+            else:
+                year = None
+
+        return {
+            'id': ctx_id,
+            'year': year,
+            'date': date_str,
+            'period_months': period_months,
+        }
 
     def extract_entity_info(self, root: etree._Element) -> Dict[str, str]:
         """Extract entity (company) information from XBRL"""
@@ -267,7 +313,7 @@ class EnhancedXBRLParser:
         """Extract financial facts from XBRL"""
         facts_by_year = {}
 
-        for elem in root.iter():
+        for elem in _FACTS_XPATH(root):
             context_ref = elem.get('contextRef')
             if not context_ref or context_ref not in contexts:
                 continue
@@ -293,6 +339,81 @@ class EnhancedXBRLParser:
 
         return facts_by_year
 
+    def parse_file_streaming(
+        self,
+        file_path: str,
+        years: Optional[set] = None
+    ) -> Tuple[Dict[str, Dict], Dict[int, Dict[str, Decimal]]]:
+        """
+        Streaming alternative to parse_file + extract_contexts + extract_facts
+
+        Walks the file with iterparse and releases each top-level element once
+        it has been read, so memory holds the extracted facts rather than the
+        whole DOM. If given, only facts for the listed years are kept.
+
+        Returns:
+            Tuple of (contexts, facts_by_year), as extract_contexts/extract_facts
+        """
+        if not Path(file_path).exists():
+            raise XBRLParseError(f"File not found: {file_path}")
+
+        context_tag = '{%s}context' % self.XBRL_NAMESPACES['xbrli']
+        contexts = {}
+        raw_facts = []  # (contextRef, full tag, text) in document order
+
+        try:
+            for _, elem in etree.iterparse(
+                file_path, events=('end',), remove_blank_text=True, encoding='utf-8'
+            ):
+                if elem.tag == context_tag:
+                    context = self._parse_context(elem)
+                    if context is not None:
+                        contexts[context['id']] = context
+                else:
+                    context_ref = elem.get('contextRef')
+                    if context_ref:
+                        raw_facts.append((context_ref, elem.tag, elem.text))
+
+                # Release top-level elements (and anything before them) once read
+                parent = elem.getparent()
+                if parent is not None and parent.getparent() is None:
+                    elem.clear(keep_tail=True)
+                    while elem.getprevious() is not None:
+                        del parent[0]
+        except etree.XMLSyntaxError:
+            # Files needing entity/encoding fixes go through the tolerant DOM path
+            root = self.parse_file(file_path)
+            contexts = self.extract_contexts(root)
+            facts_by_year = self.extract_facts(root, contexts)
+            if years is not None:
+                facts_by_year = {y: f for y, f in facts_by_year.items() if y in years}
+            return contexts, facts_by_year
+        except (OSError, etree.LxmlError) as e:
+            raise XBRLParseError(f"Error parsing XBRL file: {e}")
+
+        # Resolved after the walk: contexts may follow the facts that use them
+        facts_by_year = {}
+        for context_ref, full_tag, value_text in raw_facts:
+            context = contexts.get(context_ref)
+            if context is None:
+                continue
+
+            year = context['year']
+            if not year or (years is not None and year not in years):
+                continue
+
+            if year not in facts_by_year:
+                facts_by_year[year] = {}
+
+            if value_text:
+                try:
+                    cleaned = self.clean_xbrl_text(value_text)
+                    facts_by_year[year][full_tag] = Decimal(cleaned.replace(',', '.'))
+                except:
+                    continue
+
+        return contexts, facts_by_year
+
     def _extract_value_by_priority(
         self,
         facts: Dict[str, Decimal],
@@ -308,66 +429,60 @@ class EnhancedXBRLParser:
         Returns:
             Tuple of (value, matched_tag) or (None, None) if not found
         """
+        # Fact local names, resolved once for this lookup
+        local_facts = [(_local_name(fact_tag), value) for fact_tag, value in facts.items()]
+
         # Special handling for accumulate_all fields (like reserves)
         # Try detail_tags FIRST if accumulate_all is set
         if field_config.get('accumulate_all', False) and 'detail_tags' in field_config:
-            accumulated = Decimal('0')
-            found_any = False
-            matched_tags = []
-
-            for detail_tag in field_config['detail_tags']:
-                expected_local = detail_tag.split(':')[-1]
-
-                for fact_tag, value in facts.items():
-                    local_name = etree.QName(fact_tag).localname if fact_tag.startswith('{') else fact_tag.split(':')[-1]
-
-                    if local_name == expected_local:
-                        accumulated += value
-                        found_any = True
-                        matched_tags.append(expected_local)
-
-            if found_any:
-                return accumulated, f'detail_tags_accumulated ({len(matched_tags)} items)'
+            matched_values = self._detail_tag_values(local_facts, field_config['detail_tags'])
+            if matched_values:
+                return sum(matched_values, Decimal('0')), f'detail_tags_accumulated ({len(matched_values)} items)'
 
         # Try priorities in order (for non-accumulate_all or if detail_tags didn't match)
-        for priority_key in ['priority_1', 'priority_2', 'priority_3', 'priority_4', 'priority_5']:
-            if priority_key not in field_config:
-                continue
-
-            xbrl_tag = field_config[priority_key]
-            expected_local = xbrl_tag.split(':')[-1]
+        priority_entries = self._priority_entries.get(id(field_config))
+        if priority_entries is None:
+            priority_entries = self._compile_priorities(field_config)
 
+        for expected_local, xbrl_tag, needs_totale in priority_entries:
             # Try to find matching tag in facts
-            for fact_tag, value in facts.items():
-                local_name = etree.QName(fact_tag).localname if fact_tag.startswith('{') else fact_tag.split(':')[-1]
-
+            for local_name, value in local_facts:
                 # Exact match
                 if local_name == expected_local:
                     return value, xbrl_tag
 
                 # Match with "Totale" prefix
-                if local_name.startswith('Totale') and expected_local in local_name:
+                if needs_totale and local_name.startswith('Totale') and expected_local in local_name:
                     return value, xbrl_tag
 
         # Try detail_tags if present and not already tried (for non-accumulate_all)
         if not field_config.get('accumulate_all', False) and 'detail_tags' in field_config:
-            accumulated = Decimal('0')
-            found_any = False
-
-            for detail_tag in field_config['detail_tags']:
-                expected_local = detail_tag.split(':')[-1]
+            matched_values = self._detail_tag_values(local_facts, field_config['detail_tags'])
+            if matched_values:
+                return sum(matched_values, Decimal('0')), 'detail_tags_accumulated'
 
-                for fact_tag, value in facts.items():
-                    local_name = etree.QName(fact_tag).localname if fact_tag.startswith('{') else fact_tag.split(':')[-1]
+        return None, None
 
-                    if local_name == expected_local:
-                        accumulated += value
-                        found_any = True
+    @staticmethod
+    def _detail_tag_values(
+        local_facts: List[Tuple[str, Decimal]],
+        detail_tags: List[str]
+    ) -> List[Decimal]:
+        """
+        Values of every fact matching one of detail_tags, in detail_tags order
 
-            if found_any:
-                return accumulated, 'detail_tags_accumulated'
+        Facts are grouped by local name in one pass, so each detail tag is a
+        dict lookup rather than a scan over all facts.
+        """
+        values_by_local = defaultdict(list)
+        for local_name, value in local_facts:
+            values_by_local[local_name].append(value)
 
-        return None, None
+        return [
+            value
+            for detail_tag in detail_tags
+            for value in values_by_local.get(detail_tag.split(':')[-1], ())
+        ]
 
     def map_facts_to_fields_with_reconciliation(
         self,
@@ -379,9 +494,9 @@ class EnhancedXBRLParser:
         Returns:
             Tuple of (balance_sheet_data, income_statement_data, reconciliation_info)
         """
-        bs_data = {}
-        inc_data = {}
-        aggregates = {}
+        bs_data = defaultdict(Decimal)
+        inc_data = defaultdict(Decimal)
+        aggregates = defaultdict(Decimal)
         reconciliation_info = {
             'unmapped_tags': [],
             'aggregate_totals': {},
@@ -423,7 +538,7 @@ class EnhancedXBRLParser:
                 if isinstance(field_config, dict):
                     value, matched_tag = self._extract_value_by_priority(facts, field_config)
                     if value is not None:
-                        bs_data[field] = bs_data.get(field, Decimal('0')) + value
+                        bs_data[field] += value
                         reconciliation_info['priority_matches'][field] = matched_tag
                         v2_mapped_fields_bs.add(field)  # Track successfully mapped fields
 
@@ -433,7 +548,7 @@ class EnhancedXBRLParser:
                 if isinstance(field_config, dict):
                     value, matched_tag = self._extract_value_by_priority(facts, field_config)
                     if value is not None:
-                        inc_data[field] = inc_data.get(field, Decimal('0')) + value
+                        inc_data[field] += value
                         reconciliation_info['priority_matches'][field] = matched_tag
                         v2_mapped_fields_inc.add(field)  # Track successfully mapped fields
 
@@ -491,9 +606,9 @@ class EnhancedXBRLParser:
                         'sp17g_altri_debiti_lungo',
                     }
                     if field in ACCUMULATE_FIELDS:
-                        bs_data[field] = bs_data.get(field, Decimal('0')) + value
+                        bs_data[field] += value
                     elif field not in bs_data or bs_data[field] == Decimal('0'):
-                        bs_data[field] = bs_data.get(field, Decimal('0')) + value
+                        bs_data[field] += value
                     matched = True
                     matched_tags.add(local_name)
                     break
@@ -505,7 +620,7 @@ class EnhancedXBRLParser:
                         break
 
                     if field not in bs_data or bs_data[field] == Decimal('0'):
-                        bs_data[field] = bs_data.get(field, Decimal('0')) + value
+                        bs_data[field] += value
                     matched = True
                     matched_tags.add(local_name)
                     break
@@ -522,7 +637,7 @@ class EnhancedXBRLParser:
                             break
 
                         if field not in inc_data or inc_data[field] == Decimal('0'):
-                            inc_data[field] = inc_data.get(field, Decimal('0')) + value
+                            inc_data[field] += value
                         matched = True
                         matched_tags.add(local_name)
                         break
@@ -534,7 +649,7 @@ class EnhancedXBRLParser:
                             break
 
                         if field not in inc_data or inc_data[field] == Decimal('0'):
-                            inc_data[field] = inc_data.get(field, Decimal('0')) + value
+                            inc_data[field] += value
                         matched = True
                         matched_tags.add(local_name)
                         break
@@ -560,7 +675,7 @@ class EnhancedXBRLParser:
 
             if abs(diff_crediti) > Decimal('0.01'):
                 # Add difference to short-term credits (catch-all)
-                bs_data['sp06_crediti_breve'] = bs_data.get('sp06_crediti_breve', Decimal('0')) + diff_crediti
+                bs_data['sp06_crediti_breve'] += diff_crediti
                 reconciliation_info['reconciliation_adjustments']['crediti'] = {
                     'xbrl_total': float(total_crediti_xbrl),
                     'imported_sum': float(imported_crediti),
@@ -580,7 +695,7 @@ class EnhancedXBRLParser:
             diff_debiti = total_debiti_xbrl - imported_debiti
 
             if abs(diff_debiti) > Decimal('0.01'):
-                bs_data['sp16_debiti_breve'] = bs_data.get('sp16_debiti_breve', Decimal('0')) + diff_debiti
+                bs_data['sp16_debiti_breve'] += diff_debiti
                 reconciliation_info['reconciliation_adjustments']['debiti'] = {
                     'xbrl_total': float(total_debiti_xbrl),
                     'imported_sum': float(imported_debiti),
@@ -588,7 +703,7 @@ class EnhancedXBRLParser:
                     'applied_to': 'sp16_debiti_breve'
                 }
 
-        return bs_data, inc_data, reconciliation_info
+        return dict(bs_data), dict(inc_data), reconciliation_info
 
     def import_to_database(
         self,
@@ -4,163 +4,216 @@ Check if ATTIVO = PASSIVO in the XBRL file itself
 """
 from lxml import etree
 from pathlib import Path
-from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+import re
 import sys
 
+# Tag name classifiers (one regex scan instead of one substring test per keyword)
+_ATTIVO_RE = re.compile('Immobilizzazioni|Crediti|Rimanenze|Disponibilita|Attiv|Circolante')
+_PASSIVO_RE = re.compile('Patrimonio|Capital|Riserv|Utile|Debiti|TFR|Fondi|PassivRatei')
+_PASSIV_RE = re.compile('Passiv')
+
+# First characters a numeric fact value can start with
+_NUMSTART = frozenset('-+0123456789.')
+
+_XBRLI = '{http://www.xbrl.org/2003/instance}'
+XBRLI_CONTEXT = _XBRLI + 'context'
+
+
+def _local(tag):
+    """Local name of a Clark-notation tag ('{ns}local' -> 'local')"""
+    i = tag.rfind('}')
+    return tag[i + 1:] if i >= 0 else tag
+
+
+def _cents(s):
+    """Parse a monetary fact value into integer cents"""
+    return int(round(float(s.replace(',', '.')) * 100))
+
+
+def _parse_context(ctx):
+    """Extract id, date and period type from an xbrli:context element"""
+    ctx_id = ctx.get('id')
+    period = ctx.find(_XBRLI + 'period')
+
+    if period is not None and len(period):
+        first = period[0]
+        if first.tag == _XBRLI + 'instant':
+            return {
+                'id': ctx_id,
+                'date': first.text,
+                'type': 'instant'
+            }
+        end_date = period.find(_XBRLI + 'endDate')
+        if end_date is not None:
+            return {
+                'id': ctx_id,
+                'date': end_date.text,
+                'type': 'duration'
+            }
+    return None
+
+
+def _analyze_context(ctx_id, ctx_info, facts):
+    """Build the balance report for one instant context; facts are (local_name, cents) pairs"""
+    out = []
+
+    out.append(f"\n{'=' * 80}")
+    out.append(f"Context: {ctx_id} - Date: {ctx_info['date']}")
+    out.append('=' * 80)
+
+    # Extract all balance sheet related tags (values in integer cents)
+    attivo_tags = []
+    passivo_tags = []
+    total_attivo = None
+    total_passivo = None
+
+    for local_name, value in facts:
+        # Look for total tags
+        if local_name == 'TotaleAttivo':
+            total_attivo = value
+            out.append(f"\n✓ Found TotaleAttivo: €{value / 100:,.2f}")
+        elif local_name == 'TotalePassivo':
+            total_passivo = value
+            out.append(f"✓ Found TotalePassivo: €{value / 100:,.2f}")
+
+        # Categorize as Attivo or Passivo based on tag name
+        if _ATTIVO_RE.search(local_name) and not _PASSIV_RE.search(local_name):
+            attivo_tags.append((local_name, value))
+
+        if _PASSIVO_RE.search(local_name):
+            passivo_tags.append((local_name, value))
+
+    # Display results (totals are only formatted when both are present)
+    has_totals = total_attivo is not None and total_passivo is not None
+
+    if has_totals:
+        out.append(f"\n{'─' * 80}")
+        out.append("OFFICIAL TOTALS FROM XBRL:")
+        out.append(f"{'─' * 80}")
+        out.append(f"  Totale Attivo:   €{total_attivo / 100:>15,.2f}")
+        out.append(f"  Totale Passivo:  €{total_passivo / 100:>15,.2f}")
+        out.append(f"  {'─' * 50}")
+        difference = total_attivo - total_passivo
+        out.append(f"  DIFFERENCE:      €{difference / 100:>15,.2f}")
+
+        if abs(difference) < 1:
+            out.append(f"\n  ✅ BALANCE SHEET IS BALANCED IN XBRL FILE!")
+        else:
+            out.append(f"\n  ❌ BALANCE SHEET IS NOT BALANCED IN XBRL FILE!")
+            out.append(f"     Discrepancy: €{difference / 100:,.2f}")
+    else:
+        out.append(f"\n⚠️  Warning: Could not find TotaleAttivo and/or TotalePassivo tags")
+        out.append(f"   This may be an abbreviated schema or missing aggregate totals")
+
+    # Show detailed breakdown
+    out.append(f"\n{'─' * 80}")
+    out.append("DETAILED BREAKDOWN OF TAGS:")
+    out.append(f"{'─' * 80}")
+
+    out.append(f"\nATTIVO (Assets) - {len(attivo_tags)} tags found:")
+    out.append(f"{'─' * 80}")
+    attivo_sum = sum(value for tag, value in attivo_tags if 'Totale' not in tag)
+    for tag, value in sorted(attivo_tags, key=itemgetter(1), reverse=True):
+        if 'Totale' in tag:
+            out.append(f"  {tag:<55} €{value / 100:>15,.2f} [TOTAL]")
+        else:
+            out.append(f"  {tag:<55} €{value / 100:>15,.2f}")
+
+    out.append(f"\nPASSIVO (Liabilities & Equity) - {len(passivo_tags)} tags found:")
+    out.append(f"{'─' * 80}")
+    passivo_sum = sum(value for tag, value in passivo_tags if 'Totale' not in tag)
+    for tag, value in sorted(passivo_tags, key=itemgetter(1), reverse=True):
+        if 'Totale' in tag:
+            out.append(f"  {tag:<55} €{value / 100:>15,.2f} [TOTAL]")
+        else:
+            out.append(f"  {tag:<55} €{value / 100:>15,.2f}")
+
+    out.append(f"\n{'─' * 80}")
+    out.append("SUMMARY OF DETAIL ITEMS (excluding aggregate totals):")
+    out.append(f"{'─' * 80}")
+    out.append(f"  Sum of Attivo detail items:   €{attivo_sum / 100:>15,.2f}")
+    out.append(f"  Sum of Passivo detail items:  €{passivo_sum / 100:>15,.2f}")
+    out.append(f"  {'─' * 50}")
+    detail_diff = attivo_sum - passivo_sum
+    out.append(f"  Difference in details:        €{detail_diff / 100:>15,.2f}")
+
+    if has_totals:
+        out.append(f"\n{'─' * 80}")
+        out.append("COMPARISON: Official Totals vs. Sum of Details:")
+        out.append(f"{'─' * 80}")
+        out.append(f"  Official TotaleAttivo:        €{total_attivo / 100:>15,.2f}")
+        out.append(f"  Sum of Attivo details:        €{attivo_sum / 100:>15,.2f}")
+        out.append(f"  Missing from details:         €{(total_attivo - attivo_sum) / 100:>15,.2f}")
+        out.append('')
+        out.append(f"  Official TotalePassivo:       €{total_passivo / 100:>15,.2f}")
+        out.append(f"  Sum of Passivo details:       €{passivo_sum / 100:>15,.2f}")
+        out.append(f"  Missing from details:         €{(total_passivo - passivo_sum) / 100:>15,.2f}")
+
+    out.append(f"\n{'=' * 80}\n")
+
+    return '\n'.join(out)
+
+
 def analyze_xbrl_balance(xbrl_path):
     """Analyze if XBRL file has balanced balance sheet"""
 
-    # Parse XBRL
-    parser = etree.XMLParser(remove_blank_text=True, encoding='utf-8')
-    tree = etree.parse(xbrl_path, parser)
-    root = tree.getroot()
-
-    print("=" * 80)
-    print("XBRL BALANCE SHEET BALANCE ANALYSIS")
-    print("=" * 80)
-    print(f"\nFile: {xbrl_path}")
+    # Collect report lines and write them out in one go
+    out = []
 
-    # Find all contexts
+    # Single streaming pass: collect contexts and group facts by contextRef
     contexts = {}
-    for ctx in root.findall('.//{http://www.xbrl.org/2003/instance}context'):
-        ctx_id = ctx.get('id')
-        period = ctx.find('.//{http://www.xbrl.org/2003/instance}period')
-
-        if period is not None:
-            instant = period.find('.//{http://www.xbrl.org/2003/instance}instant')
-            if instant is not None:
-                contexts[ctx_id] = {
-                    'id': ctx_id,
-                    'date': instant.text,
-                    'type': 'instant'
-                }
-            else:
-                end_date = period.find('.//{http://www.xbrl.org/2003/instance}endDate')
-                if end_date is not None:
-                    contexts[ctx_id] = {
-                        'id': ctx_id,
-                        'date': end_date.text,
-                        'type': 'duration'
-                    }
-
-    print(f"\nContexts found: {len(contexts)}")
-
-    # Analyze each context
-    for ctx_id, ctx_info in contexts.items():
-        if ctx_info['type'] != 'instant':
-            continue  # Skip duration contexts (income statement)
-
-        print(f"\n{'=' * 80}")
-        print(f"Context: {ctx_id} - Date: {ctx_info['date']}")
-        print('=' * 80)
-
-        # Extract all balance sheet related tags
-        attivo_tags = []
-        passivo_tags = []
-        total_attivo = None
-        total_passivo = None
-
-        for elem in root.iter():
-            if elem.get('contextRef') != ctx_id:
-                continue
-
-            try:
-                local_name = etree.QName(elem).localname
-                if not elem.text:
-                    continue
-
-                value = Decimal(elem.text.replace(',', '.'))
-
-                # Look for total tags
-                if local_name == 'TotaleAttivo':
-                    total_attivo = value
-                    print(f"\n✓ Found TotaleAttivo: €{value:,.2f}")
-                elif local_name == 'TotalePassivo':
-                    total_passivo = value
-                    print(f"✓ Found TotalePassivo: €{value:,.2f}")
-
-                # Categorize as Attivo or Passivo based on tag name
-                if any(x in local_name for x in ['Immobilizzazioni', 'Crediti', 'Rimanenze',
-                                                   'Disponibilita', 'Attiv', 'Circolante']):
-                    if 'Passiv' not in local_name:
-                        attivo_tags.append((local_name, value))
-
-                if any(x in local_name for x in ['Patrimonio', 'Capital', 'Riserv', 'Utile',
-                                                   'Debiti', 'TFR', 'Fondi', 'PassivRatei']):
-                    passivo_tags.append((local_name, value))
-
-            except Exception as e:
-                continue
-
-        # Display results
-        if total_attivo is not None and total_passivo is not None:
-            print(f"\n{'─' * 80}")
-            print("OFFICIAL TOTALS FROM XBRL:")
-            print(f"{'─' * 80}")
-            print(f"  Totale Attivo:   €{total_attivo:>15,.2f}")
-            print(f"  Totale Passivo:  €{total_passivo:>15,.2f}")
-            print(f"  {'─' * 50}")
-            difference = total_attivo - total_passivo
-            print(f"  DIFFERENCE:      €{difference:>15,.2f}")
-
-            if abs(difference) < 0.01:
-                print(f"\n  ✅ BALANCE SHEET IS BALANCED IN XBRL FILE!")
-            else:
-                print(f"\n  ❌ BALANCE SHEET IS NOT BALANCED IN XBRL FILE!")
-                print(f"     Discrepancy: €{difference:,.2f}")
+    facts_by_context = {}
+
+    for _, elem in etree.iterparse(str(xbrl_path), events=('end',), remove_blank_text=True,
+                                   encoding='utf-8', huge_tree=True, resolve_entities=False,
+                                   load_dtd=False, no_network=True):
+        if elem.tag == XBRLI_CONTEXT:
+            ctx_info = _parse_context(elem)
+            if ctx_info is not None:
+                contexts[ctx_info['id']] = ctx_info
         else:
-            print(f"\n⚠️  Warning: Could not find TotaleAttivo and/or TotalePassivo tags")
-            print(f"   This may be an abbreviated schema or missing aggregate totals")
-
-        # Show detailed breakdown
-        print(f"\n{'─' * 80}")
-        print("DETAILED BREAKDOWN OF TAGS:")
-        print(f"{'─' * 80}")
-
-        print(f"\nATTIVO (Assets) - {len(attivo_tags)} tags found:")
-        print(f"{'─' * 80}")
-        attivo_sum = Decimal('0')
-        for tag, value in sorted(attivo_tags, key=lambda x: x[1], reverse=True):
-            if 'Totale' in tag:
-                print(f"  {tag:<55} €{value:>15,.2f} [TOTAL]")
-            else:
-                print(f"  {tag:<55} €{value:>15,.2f}")
-                if 'Totale' not in tag:
-                    attivo_sum += value
-
-        print(f"\nPASSIVO (Liabilities & Equity) - {len(passivo_tags)} tags found:")
-        print(f"{'─' * 80}")
-        passivo_sum = Decimal('0')
-        for tag, value in sorted(passivo_tags, key=lambda x: x[1], reverse=True):
-            if 'Totale' in tag:
-                print(f"  {tag:<55} €{value:>15,.2f} [TOTAL]")
-            else:
-                print(f"  {tag:<55} €{value:>15,.2f}")
-                if 'Totale' not in tag:
-                    passivo_sum += value
-
-        print(f"\n{'─' * 80}")
-        print("SUMMARY OF DETAIL ITEMS (excluding aggregate totals):")
-        print(f"{'─' * 80}")
-        print(f"  Sum of Attivo detail items:   €{attivo_sum:>15,.2f}")
-        print(f"  Sum of Passivo detail items:  €{passivo_sum:>15,.2f}")
-        print(f"  {'─' * 50}")
-        detail_diff = attivo_sum - passivo_sum
-        print(f"  Difference in details:        €{detail_diff:>15,.2f}")
-
-        if total_attivo is not None:
-            print(f"\n{'─' * 80}")
-            print("COMPARISON: Official Totals vs. Sum of Details:")
-            print(f"{'─' * 80}")
-            print(f"  Official TotaleAttivo:        €{total_attivo:>15,.2f}")
-            print(f"  Sum of Attivo details:        €{attivo_sum:>15,.2f}")
-            print(f"  Missing from details:         €{total_attivo - attivo_sum:>15,.2f}")
-            print()
-            print(f"  Official TotalePassivo:       €{total_passivo:>15,.2f}")
-            print(f"  Sum of Passivo details:       €{passivo_sum:>15,.2f}")
-            print(f"  Missing from details:         €{total_passivo - passivo_sum:>15,.2f}")
-
-        print(f"\n{'=' * 80}\n")
+            ctx_ref = elem.get('contextRef')
+            if ctx_ref is None or not isinstance(elem.tag, str):
+                continue  # Not a fact (or a child of a context still being built)
+
+            local_name = _local(elem.tag)
+            text = elem.text
+            if text:
+                text = text.strip()
+            if text and text[0] in _NUMSTART:
+                try:
+                    value = _cents(text)
+                    facts_by_context.setdefault(ctx_ref, []).append((local_name, value))
+                except (ValueError, OverflowError):
+                    pass
+
+        # Drop already processed siblings to keep memory flat
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+
+    out.append("=" * 80)
+    out.append("XBRL BALANCE SHEET BALANCE ANALYSIS")
+    out.append("=" * 80)
+    out.append(f"\nFile: {xbrl_path}")
+
+    out.append(f"\nContexts found: {len(contexts)}")
+
+    # Analyze each instant context (duration contexts are the income statement).
+    # Contexts are independent, so multi-period filings are fanned out to worker processes.
+    ctx_ids = [ctx_id for ctx_id, ctx_info in contexts.items() if ctx_info['type'] == 'instant']
+    ctx_infos = [contexts[ctx_id] for ctx_id in ctx_ids]
+    ctx_facts = [facts_by_context.get(ctx_id, []) for ctx_id in ctx_ids]
+
+    if len(ctx_ids) > 1:
+        with ProcessPoolExecutor() as executor:
+            out.extend(executor.map(_analyze_context, ctx_ids, ctx_infos, ctx_facts))
+    else:
+        out.extend(map(_analyze_context, ctx_ids, ctx_infos, ctx_facts))
+
+    sys.stdout.write('\n'.join(out) + '\n')
 
 if __name__ == '__main__':
     if len(sys.argv) > 1:
@@ -4,77 +4,129 @@ This script analyzes an XBRL file to identify unmapped tags
 """
 from lxml import etree
 from pathlib import Path
+import functools
+import itertools
 import json
 import sys
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_XBRLI = '{http://www.xbrl.org/2003/instance}'
+
+# Number of contexts listed per unmapped tag
+MAX_REPORTED_CONTEXTS = 3
+
+# First characters a numeric fact value can start with
+_NUMSTART = frozenset('-+0123456789.')
+
+def _local(tag):
+    """Local name of a Clark-notation tag ('{ns}local' -> 'local')"""
+    i = tag.rfind('}')
+    return tag[i + 1:] if i >= 0 else tag
+
+def _release(elem):
+    """Free a processed element and its already-processed preceding siblings"""
+    elem.clear(keep_tail=True)
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+@functools.lru_cache(maxsize=1)
 def load_taxonomy_mapping():
-    """Load taxonomy mapping from JSON"""
-    mapping_path = Path(__file__).parent / 'data' / 'taxonomy_mapping.json'
-    with open(mapping_path, 'r', encoding='utf-8') as f:
-        taxonomy = json.load(f)
-        return taxonomy['balance_sheet_mapping'], taxonomy['income_statement_mapping']
+    """
+    Load taxonomy mapping from JSON (parsed once per process)
+
+    Returns (balance_sheet_mapping, income_statement_mapping, mapped_local_names)
+    """
+    # The mapping lives in the project-level data/ directory, next to legacy/
+    mapping_path = Path(__file__).resolve().parent.parent / 'data' / 'taxonomy_mapping.json'
+    if orjson is not None:
+        taxonomy = orjson.loads(mapping_path.read_bytes())
+    else:
+        with open(mapping_path, 'r', encoding='utf-8') as f:
+            taxonomy = json.load(f)
+    bs_mapping = taxonomy['balance_sheet_mapping']
+    inc_mapping = taxonomy['income_statement_mapping']
+    mapped_tags = frozenset(k.rpartition(':')[2] for k in itertools.chain(bs_mapping, inc_mapping))
+    return bs_mapping, inc_mapping, mapped_tags
 
 def analyze_xbrl_file(xbrl_path):
     """Analyze XBRL file and report on mapping coverage"""
 
-    # Parse XBRL
-    parser = etree.XMLParser(remove_blank_text=True, encoding='utf-8')
-    tree = etree.parse(xbrl_path, parser)
-    root = tree.getroot()
-
-    # Load mappings
-    bs_mapping, inc_mapping = load_taxonomy_mapping()
+    # Collect report lines and write them out in one go
+    out = []
 
-    # Combine all mapped tags (get local names)
-    mapped_tags = set()
-    for xbrl_tag in list(bs_mapping.keys()) + list(inc_mapping.keys()):
-        local_name = xbrl_tag.split(':')[-1]
-        mapped_tags.add(local_name)
+    # Load mappings (mapped_tags: local names of all mapped tags)
+    bs_mapping, inc_mapping, mapped_tags = load_taxonomy_mapping()
 
     # Find all numeric facts in XBRL
     numeric_facts = {}
+    facts_by_ctx = {}  # (local_name, contextRef) -> first value seen
     all_tags = set()
+    context_ids = []
+
+    # Stream the XBRL: only extracted facts and context ids are kept in memory
+    for _, elem in etree.iterparse(str(xbrl_path), events=('end',), remove_blank_text=True,
+                                   encoding='utf-8', huge_tree=True, resolve_entities=False,
+                                   load_dtd=False, no_network=True):
+        if elem.tag == _XBRLI + 'context':
+            context_ids.append(elem.get('id'))
+            _release(elem)
+            continue
 
-    for elem in root.iter():
-        # Skip if no contextRef (not a fact)
-        if elem.get('contextRef') is None:
+        # Skip if no contextRef (not a fact) or not an element (comments, PIs)
+        ctx_ref = elem.get('contextRef')
+        if ctx_ref is None or not isinstance(elem.tag, str):
             continue
 
-        # Get local name
-        try:
-            local_name = etree.QName(elem).localname
-        except:
+        # Get local name and value text, then release the element.
+        # Names repeat across thousands of facts, so keep a single interned copy.
+        ctx_ref = sys.intern(ctx_ref)
+        local_name = sys.intern(_local(elem.tag))
+        text = elem.text
+        _release(elem)
+
+        # Cheap pre-check so string facts never reach float()
+        if not text:
+            continue
+        text = text.strip()
+        if not text or text[0] not in _NUMSTART:
             continue
 
         # Try to parse as number
-        if elem.text:
-            try:
-                value = float(elem.text.replace(',', '.'))
-                all_tags.add(local_name)
-
-                # Check if mapped
-                is_mapped = local_name in mapped_tags
-
-                if local_name not in numeric_facts:
-                    numeric_facts[local_name] = {
-                        'count': 0,
-                        'sample_value': value,
-                        'mapped': is_mapped,
-                        'contexts': []
-                    }
-
-                numeric_facts[local_name]['count'] += 1
-                numeric_facts[local_name]['contexts'].append(elem.get('contextRef'))
-            except:
-                pass
+        try:
+            value = float(text.replace(',', '.'))
+        except ValueError:
+            continue
+
+        all_tags.add(local_name)
+
+        # Check if mapped
+        is_mapped = local_name in mapped_tags
+
+        if local_name not in numeric_facts:
+            numeric_facts[local_name] = {
+                'count': 0,
+                'sample_value': value,
+                'mapped': is_mapped,
+                'contexts': []
+            }
+
+        numeric_facts[local_name]['count'] += 1
+        # Only the first few contexts are reported, so stop collecting after that
+        if len(numeric_facts[local_name]['contexts']) < MAX_REPORTED_CONTEXTS:
+            numeric_facts[local_name]['contexts'].append(ctx_ref)
+        facts_by_ctx.setdefault((local_name, ctx_ref), value)
 
     # Report results
-    print("=" * 80)
-    print("XBRL MAPPING ANALYSIS")
-    print("=" * 80)
-    print(f"\nFile: {xbrl_path}")
-    print(f"Total numeric tags found: {len(numeric_facts)}")
-    print(f"Mapped tags in taxonomy: {len(mapped_tags)}")
+    out.append("=" * 80)
+    out.append("XBRL MAPPING ANALYSIS")
+    out.append("=" * 80)
+    out.append(f"\nFile: {xbrl_path}")
+    out.append(f"Total numeric tags found: {len(numeric_facts)}")
+    out.append(f"Mapped tags in taxonomy: {len(mapped_tags)}")
 
     # Find unmapped tags
     unmapped = []
@@ -86,39 +138,36 @@ def analyze_xbrl_file(xbrl_path):
         else:
             unmapped.append((tag, info))
 
-    print(f"\n✓ Mapped tags found: {len(mapped)}")
-    print(f"✗ Unmapped tags found: {len(unmapped)}")
+    out.append(f"\n✓ Mapped tags found: {len(mapped)}")
+    out.append(f"✗ Unmapped tags found: {len(unmapped)}")
 
     if unmapped:
-        print("\n" + "=" * 80)
-        print("UNMAPPED TAGS (these values are NOT being imported):")
-        print("=" * 80)
+        out.append("\n" + "=" * 80)
+        out.append("UNMAPPED TAGS (these values are NOT being imported):")
+        out.append("=" * 80)
         for tag, info in sorted(unmapped):
-            print(f"\n  Tag: {tag}")
-            print(f"  Occurrences: {info['count']}")
-            print(f"  Sample value: {info['sample_value']:,.2f}")
-            print(f"  Contexts: {', '.join(info['contexts'][:3])}")
+            out.append(f"\n  Tag: {tag}")
+            out.append(f"  Occurrences: {info['count']}")
+            out.append(f"  Sample value: {info['sample_value']:,.2f}")
+            out.append(f"  Contexts: {', '.join(info['contexts'])}")
 
     if mapped:
-        print("\n" + "=" * 80)
-        print("MAPPED TAGS (these values ARE being imported):")
-        print("=" * 80)
+        out.append("\n" + "=" * 80)
+        out.append("MAPPED TAGS (these values ARE being imported):")
+        out.append("=" * 80)
         for tag, info in sorted(mapped):
-            print(f"\n  Tag: {tag}")
-            print(f"  Occurrences: {info['count']}")
-            print(f"  Sample value: {info['sample_value']:,.2f}")
+            out.append(f"\n  Tag: {tag}")
+            out.append(f"  Occurrences: {info['count']}")
+            out.append(f"  Sample value: {info['sample_value']:,.2f}")
 
     # Check for potential aggregation issues
-    print("\n" + "=" * 80)
-    print("AGGREGATION CHECK:")
-    print("=" * 80)
+    out.append("\n" + "=" * 80)
+    out.append("AGGREGATION CHECK:")
+    out.append("=" * 80)
 
     # Calculate totals from sample_data.xbrl if that's what we're analyzing
-    contexts = root.findall('.//{http://www.xbrl.org/2003/instance}context')
-
-    for ctx in contexts[:1]:  # Just check first context
-        ctx_id = ctx.get('id')
-        print(f"\nContext: {ctx_id}")
+    for ctx_id in context_ids[:1]:  # Just check first context
+        out.append(f"\nContext: {ctx_id}")
 
         # Calculate asset total
         asset_total = 0
@@ -150,44 +199,33 @@ def analyze_xbrl_file(xbrl_path):
             'RateiERiscontiPassivi'
         ]
 
-        print("\n  Assets:")
+        out.append("\n  Assets:")
         for field in asset_fields:
-            if field in numeric_facts:
-                # Find value for this context
-                for elem in root.iter():
-                    try:
-                        if etree.QName(elem).localname == field and elem.get('contextRef') == ctx_id:
-                            value = float(elem.text)
-                            asset_total += value
-                            status = "✓" if field in mapped_tags else "✗"
-                            print(f"    {status} {field}: {value:,.0f}")
-                            break
-                    except:
-                        pass
-
-        print(f"\n  Total Assets: {asset_total:,.0f}")
-
-        print("\n  Liabilities & Equity:")
+            value = facts_by_ctx.get((field, ctx_id))
+            if value is not None:
+                asset_total += value
+                status = "✓" if field in mapped_tags else "✗"
+                out.append(f"    {status} {field}: {value:,.0f}")
+
+        out.append(f"\n  Total Assets: {asset_total:,.0f}")
+
+        out.append("\n  Liabilities & Equity:")
         for field in liability_fields:
-            if field in numeric_facts:
-                for elem in root.iter():
-                    try:
-                        if etree.QName(elem).localname == field and elem.get('contextRef') == ctx_id:
-                            value = float(elem.text)
-                            liability_total += value
-                            status = "✓" if field in mapped_tags else "✗"
-                            print(f"    {status} {field}: {value:,.0f}")
-                            break
-                    except:
-                        pass
-
-        print(f"\n  Total Liabilities & Equity: {liability_total:,.0f}")
-        print(f"\n  DIFFERENCE (Asset - Liability): {asset_total - liability_total:,.0f}")
+            value = facts_by_ctx.get((field, ctx_id))
+            if value is not None:
+                liability_total += value
+                status = "✓" if field in mapped_tags else "✗"
+                out.append(f"    {status} {field}: {value:,.0f}")
+
+        out.append(f"\n  Total Liabilities & Equity: {liability_total:,.0f}")
+        out.append(f"\n  DIFFERENCE (Asset - Liability): {asset_total - liability_total:,.0f}")
 
         if abs(asset_total - liability_total) > 0.01:
-            print("  ⚠️  WARNING: Balance sheet does not balance!")
+            out.append("  ⚠️  WARNING: Balance sheet does not balance!")
         else:
-            print("  ✓ Balance sheet balances correctly")
+            out.append("  ✓ Balance sheet balances correctly")
+
+    sys.stdout.write('\n'.join(out) + '\n')
 
 if __name__ == '__main__':
     if len(sys.argv) > 1:
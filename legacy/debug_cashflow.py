@@ -6,11 +6,30 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 from decimal import Decimal
+from sqlalchemy.orm import load_only
 from database.db import SessionLocal
 from database.models import Company, FinancialYear, BalanceSheet, IncomeStatement
 from app.calculations.cashflow_detailed import DetailedCashFlowCalculator
 
 
+# Cash flow results keyed by (bs_previous.id, bs_current.id, inc_current.id, year)
+_cashflow_cache = {}
+
+
+def _calculate_cashflow(bs_current, bs_previous, inc_current, year):
+    """DetailedCashFlowCalculator.calculate, memoized on the statement ids"""
+    key = (bs_previous.id, bs_current.id, inc_current.id, year)
+    cashflow = _cashflow_cache.get(key)
+    if cashflow is None:
+        cashflow = _cashflow_cache[key] = DetailedCashFlowCalculator.calculate(
+            bs_current=bs_current,
+            bs_previous=bs_previous,
+            inc_current=inc_current,
+            year=year
+        )
+    return cashflow
+
+
 def debug_cashflow_2024():
     """Debug cash flow calculation for 2024"""
     print("=" * 80)
@@ -21,7 +40,7 @@ def debug_cashflow_2024():
 
     try:
         # Find company
-        company = db.query(Company).first()
+        company = db.query(Company).options(load_only(Company.id, Company.name)).first()
         if not company:
             print("❌ No company found")
             return
@@ -29,28 +48,32 @@ def debug_cashflow_2024():
         print(f"\n✓ Company: {company.name}")
 
         # Get financial years
-        fy_2023 = db.query(FinancialYear).filter(
+        # Both years in one round-trip (only id/year are needed to look up the statements)
+        fys = {}
+        for fy in db.query(FinancialYear).options(
+            load_only(FinancialYear.id, FinancialYear.year)
+        ).filter(
             FinancialYear.company_id == company.id,
-            FinancialYear.year == 2023
-        ).first()
+            FinancialYear.year.in_([2023, 2024])
+        ):
+            fys.setdefault(fy.year, fy)
 
-        fy_2024 = db.query(FinancialYear).filter(
-            FinancialYear.company_id == company.id,
-            FinancialYear.year == 2024
-        ).first()
+        fy_2023 = fys.get(2023)
+        fy_2024 = fys.get(2024)
 
         if not fy_2023 or not fy_2024:
             print("❌ Financial years 2023 or 2024 not found")
             return
 
-        # Get balance sheets
-        bs_2023 = db.query(BalanceSheet).filter(
-            BalanceSheet.financial_year_id == fy_2023.id
-        ).first()
+        # Get balance sheets (full rows: DetailedCashFlowCalculator reads most columns)
+        bss = {}
+        for bs in db.query(BalanceSheet).filter(
+            BalanceSheet.financial_year_id.in_([fy_2023.id, fy_2024.id])
+        ):
+            bss.setdefault(bs.financial_year_id, bs)
 
-        bs_2024 = db.query(BalanceSheet).filter(
-            BalanceSheet.financial_year_id == fy_2024.id
-        ).first()
+        bs_2023 = bss.get(fy_2023.id)
+        bs_2024 = bss.get(fy_2024.id)
 
         # Get income statement
         inc_2024 = db.query(IncomeStatement).filter(
@@ -100,7 +123,7 @@ def debug_cashflow_2024():
         print("CALCULATING CASH FLOW")
         print("=" * 80)
 
-        cashflow = DetailedCashFlowCalculator.calculate(
+        cashflow = _calculate_cashflow(
             bs_current=bs_2024,
             bs_previous=bs_2023,
             inc_current=inc_2024,
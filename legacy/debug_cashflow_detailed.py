@@ -6,102 +6,104 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
 from decimal import Decimal
+from sqlalchemy.orm import joinedload
 from database.db import SessionLocal
-from database.models import Company, FinancialYear, BalanceSheet, IncomeStatement
+from database.models import Company, FinancialYear
 from app.calculations.cashflow_detailed import DetailedCashFlowCalculator
 
 
-def debug_cashflow_istanza():
-    """Debug cash flow for ISTANZA company"""
-    print("=" * 80)
-    print("DEBUG: Cash Flow for ISTANZA02353550391")
-    print("=" * 80)
+def debug_cashflow_istanza(verbose: bool = True):
+    """
+    Debug cash flow for ISTANZA company
+
+    With verbose=False nothing is printed; the computed totals and their
+    match flags are returned either way (None if the data is missing).
+    """
+    if verbose:
+        print("=" * 80)
+        print("DEBUG: Cash Flow for ISTANZA02353550391")
+        print("=" * 80)
 
     db = SessionLocal()
 
     try:
-        # Find the ISTANZA company (by tax_id)
-        company = db.query(Company).filter(
+        # Find the ISTANZA company (by tax_id) with its years and statements
+        # joined in, so the whole lookup is a single query
+        years = joinedload(Company.financial_years)
+        company = db.query(Company).options(
+            years.joinedload(FinancialYear.balance_sheet),
+            years.joinedload(FinancialYear.income_statement),
+        ).filter(
             Company.tax_id == '02353550391'
         ).first()
 
         if not company:
             print("❌ ISTANZA company not found. Available companies:")
-            companies = db.query(Company).all()
-            for c in companies:
-                print(f"  - {c.name} (Tax ID: {c.tax_id})")
+            # Name and tax id only, capped: this is just a hint for the user
+            companies = db.query(Company.name, Company.tax_id).limit(50).all()
+            for name, tax_id in companies:
+                print(f"  - {name} (Tax ID: {tax_id})")
             return
 
-        print(f"\n✓ Company: {company.name}")
-        print(f"  Tax ID: {company.tax_id}")
+        if verbose:
+            print(f"\n✓ Company: {company.name}")
+            print(f"  Tax ID: {company.tax_id}")
 
-        # Get financial years
-        fy_2023 = db.query(FinancialYear).filter(
-            FinancialYear.company_id == company.id,
-            FinancialYear.year == 2023
-        ).first()
+        # Get financial years (already loaded with the company)
+        fys = {}
+        for fy in company.financial_years:
+            if fy.year in (2023, 2024):
+                fys.setdefault(fy.year, fy)
 
-        fy_2024 = db.query(FinancialYear).filter(
-            FinancialYear.company_id == company.id,
-            FinancialYear.year == 2024
-        ).first()
+        fy_2023 = fys.get(2023)
+        fy_2024 = fys.get(2024)
 
         if not fy_2023 or not fy_2024:
             print("❌ Financial years 2023 or 2024 not found")
-            available_years = db.query(FinancialYear).filter(
-                FinancialYear.company_id == company.id
-            ).all()
             print("Available years:")
-            for fy in available_years:
+            for fy in company.financial_years:
                 print(f"  - {fy.year}")
             return
 
-        # Get balance sheets
-        bs_2023 = db.query(BalanceSheet).filter(
-            BalanceSheet.financial_year_id == fy_2023.id
-        ).first()
-
-        bs_2024 = db.query(BalanceSheet).filter(
-            BalanceSheet.financial_year_id == fy_2024.id
-        ).first()
-
-        # Get income statement
-        inc_2024 = db.query(IncomeStatement).filter(
-            IncomeStatement.financial_year_id == fy_2024.id
-        ).first()
+        # Get balance sheets and income statement from the loaded years
+        bs_2023 = fy_2023.balance_sheet
+        bs_2024 = fy_2024.balance_sheet
+        inc_2024 = fy_2024.income_statement
 
         if not bs_2023 or not bs_2024 or not inc_2024:
             print("❌ Missing financial statements")
             return
 
-        print(f"\n✓ Found financial statements for 2023 and 2024")
+        if verbose:
+            print(f"\n✓ Found financial statements for 2023 and 2024")
 
         # Calculate cash flow
-        print("\n" + "=" * 80)
-        print("BALANCE SHEET VALUES")
-        print("=" * 80)
-
-        print(f"\n2023:")
-        print(f"  Capitale: €{bs_2023.sp11_capitale:,.2f}")
-        print(f"  Riserve: €{bs_2023.sp12_riserve:,.2f}")
-        print(f"  Utile: €{bs_2023.sp13_utile_perdita:,.2f}")
-        print(f"  Equity (without current profit): €{bs_2023.sp11_capitale + bs_2023.sp12_riserve:,.2f}")
-        print(f"  Debiti breve: €{bs_2023.sp16_debiti_breve:,.2f}")
-        print(f"  Debiti lungo: €{bs_2023.sp17_debiti_lungo:,.2f}")
-        print(f"  Total debt: €{bs_2023.sp16_debiti_breve + bs_2023.sp17_debiti_lungo:,.2f}")
-
-        print(f"\n2024:")
-        print(f"  Capitale: €{bs_2024.sp11_capitale:,.2f}")
-        print(f"  Riserve: €{bs_2024.sp12_riserve:,.2f}")
-        print(f"  Utile: €{bs_2024.sp13_utile_perdita:,.2f}")
-        print(f"  Equity (without current profit): €{bs_2024.sp11_capitale + bs_2024.sp12_riserve:,.2f}")
-        print(f"  Debiti breve: €{bs_2024.sp16_debiti_breve:,.2f}")
-        print(f"  Debiti lungo: €{bs_2024.sp17_debiti_lungo:,.2f}")
-        print(f"  Total debt: €{bs_2024.sp16_debiti_breve + bs_2024.sp17_debiti_lungo:,.2f}")
-
-        print(f"\n" + "=" * 80)
-        print("CHANGES (Delta)")
-        print("=" * 80)
+        if verbose:
+            print("\n" + "=" * 80)
+            print("BALANCE SHEET VALUES")
+            print("=" * 80)
+
+            print(f"\n2023:")
+            print(f"  Capitale: €{bs_2023.sp11_capitale:,.2f}")
+            print(f"  Riserve: €{bs_2023.sp12_riserve:,.2f}")
+            print(f"  Utile: €{bs_2023.sp13_utile_perdita:,.2f}")
+            print(f"  Equity (without current profit): €{bs_2023.sp11_capitale + bs_2023.sp12_riserve:,.2f}")
+            print(f"  Debiti breve: €{bs_2023.sp16_debiti_breve:,.2f}")
+            print(f"  Debiti lungo: €{bs_2023.sp17_debiti_lungo:,.2f}")
+            print(f"  Total debt: €{bs_2023.sp16_debiti_breve + bs_2023.sp17_debiti_lungo:,.2f}")
+
+            print(f"\n2024:")
+            print(f"  Capitale: €{bs_2024.sp11_capitale:,.2f}")
+            print(f"  Riserve: €{bs_2024.sp12_riserve:,.2f}")
+            print(f"  Utile: €{bs_2024.sp13_utile_perdita:,.2f}")
+            print(f"  Equity (without current profit): €{bs_2024.sp11_capitale + bs_2024.sp12_riserve:,.2f}")
+            print(f"  Debiti breve: €{bs_2024.sp16_debiti_breve:,.2f}")
+            print(f"  Debiti lungo: €{bs_2024.sp17_debiti_lungo:,.2f}")
+            print(f"  Total debt: €{bs_2024.sp16_debiti_breve + bs_2024.sp17_debiti_lungo:,.2f}")
+
+            print(f"\n" + "=" * 80)
+            print("CHANGES (Delta)")
+            print("=" * 80)
 
         equity_2023 = bs_2023.sp11_capitale + bs_2023.sp12_riserve
         equity_2024 = bs_2024.sp11_capitale + bs_2024.sp12_riserve
@@ -111,22 +113,27 @@ def debug_cashflow_istanza():
         debt_2024 = bs_2024.sp16_debiti_breve + bs_2024.sp17_debiti_lungo
         delta_debt = debt_2024 - debt_2023
 
-        print(f"\n  Delta Equity (without profit): €{delta_equity:,.2f}")
-        print(f"  Delta Debt: €{delta_debt:,.2f}")
+        if verbose:
+            print(f"\n  Delta Equity (without profit): €{delta_equity:,.2f}")
+            print(f"  Delta Debt: €{delta_debt:,.2f}")
+
+        debt_match = abs(delta_debt - Decimal('-411301')) < 1
+        equity_match = abs(delta_equity - Decimal('-9856')) < 1
 
         # Expected values
-        print(f"\n" + "=" * 80)
-        print("EXPECTED vs ACTUAL")
-        print("=" * 80)
+        if verbose:
+            print(f"\n" + "=" * 80)
+            print("EXPECTED vs ACTUAL")
+            print("=" * 80)
 
-        print(f"\n📍 Financing Activities:")
-        print(f"  Expected debt change: €-411,301")
-        print(f"  Actual debt change: €{delta_debt:,.2f}")
-        print(f"  Match: {abs(delta_debt - Decimal('-411301')) < 1}")
+            print(f"\n📍 Financing Activities:")
+            print(f"  Expected debt change: €-411,301")
+            print(f"  Actual debt change: €{delta_debt:,.2f}")
+            print(f"  Match: {debt_match}")
 
-        print(f"\n  Expected equity change: €-9,856")
-        print(f"  Actual equity change: €{delta_equity:,.2f}")
-        print(f"  Match: {abs(delta_equity - Decimal('-9856')) < 1}")
+            print(f"\n  Expected equity change: €-9,856")
+            print(f"  Actual equity change: €{delta_equity:,.2f}")
+            print(f"  Match: {equity_match}")
 
         # Calculate cashflow
         cashflow = DetailedCashFlowCalculator.calculate(
@@ -136,66 +143,89 @@ def debug_cashflow_istanza():
             year=2024
         )
 
-        print(f"\n" + "=" * 80)
-        print("CALCULATED CASH FLOW")
-        print("=" * 80)
-
-        print(f"\n🔷 Operating Activities:")
-        print(f"  Profit before adjustments: €{cashflow.operating_activities.start.profit_before_adjustments:,.2f}")
-        print(f"  Expected: €1,765,725")
-
-        print(f"\n  Non-cash adjustments: €{cashflow.operating_activities.non_cash_adjustments.total:,.2f}")
-        print(f"  Expected: €3,386,580")
-
-        print(f"\n  Cashflow before WC: €{cashflow.operating_activities.cashflow_before_wc:,.2f}")
-        print(f"  Expected: €5,152,305")
-
-        print(f"\n  WC changes total: €{cashflow.operating_activities.working_capital_changes.total:,.2f}")
-        print(f"  Expected: €3,467,353")
-
-        print(f"\n  Cashflow after WC: €{cashflow.operating_activities.cashflow_after_wc:,.2f}")
-        print(f"  Expected: €8,619,658")
-
-        print(f"\n  Cash adjustments: €{cashflow.operating_activities.cash_adjustments.total:,.2f}")
-        print(f"  Expected: €-2,029,211")
-
-        print(f"\n  ✅ Total Operating: €{cashflow.operating_activities.total_operating_cashflow:,.2f}")
-        print(f"  Expected: €6,590,447")
-        match = abs(cashflow.operating_activities.total_operating_cashflow - Decimal('6590447')) < 1000
-        print(f"  Match: {match}")
-
-        print(f"\n🔷 Investing Activities:")
-        print(f"  Total Investing: €{cashflow.investing_activities.total_investing_cashflow:,.2f}")
-        print(f"  Expected: €-6,787,084")
-        match = abs(cashflow.investing_activities.total_investing_cashflow - Decimal('-6787084')) < 10000
-        print(f"  Match: {match}")
-
-        print(f"\n🔷 Financing Activities:")
-        print(f"  Third-party funds: €{cashflow.financing_activities.third_party_funds.net:,.2f}")
-        print(f"  Expected: €-411,301")
-        match = abs(cashflow.financing_activities.third_party_funds.net - Decimal('-411301')) < 1000
-        print(f"  Match: {match}")
-
-        print(f"\n  Own funds: €{cashflow.financing_activities.own_funds.net:,.2f}")
-        print(f"  Expected: €-9,856")
-        match = abs(cashflow.financing_activities.own_funds.net - Decimal('-9856')) < 1000
-        print(f"  Match: {match}")
-
-        print(f"\n  ✅ Total Financing: €{cashflow.financing_activities.total_financing_cashflow:,.2f}")
-        print(f"  Expected: €-421,157")
-        match = abs(cashflow.financing_activities.total_financing_cashflow - Decimal('-421157')) < 1000
-        print(f"  Match: {match}")
-
-        print(f"\n🔷 Final Cash Flow:")
-        print(f"  Total: €{cashflow.cash_reconciliation.total_cashflow:,.2f}")
-        print(f"  Expected: €-617,794")
-        match = abs(cashflow.cash_reconciliation.total_cashflow - Decimal('-617794')) < 1000
-        print(f"  Match: {match}")
-
-        # Check if there are issues
-        if not match:
-            print(f"\n❌ CASH FLOW MISMATCH!")
-            print(f"   Difference: €{abs(cashflow.cash_reconciliation.total_cashflow - Decimal('-617794')):,.2f}")
+        operating = cashflow.operating_activities.total_operating_cashflow
+        investing = cashflow.investing_activities.total_investing_cashflow
+        third_party = cashflow.financing_activities.third_party_funds.net
+        own_funds = cashflow.financing_activities.own_funds.net
+        financing = cashflow.financing_activities.total_financing_cashflow
+        total = cashflow.cash_reconciliation.total_cashflow
+
+        matches = {
+            'delta_debt': debt_match,
+            'delta_equity': equity_match,
+            'operating': abs(operating - Decimal('6590447')) < 1000,
+            'investing': abs(investing - Decimal('-6787084')) < 10000,
+            'third_party_funds': abs(third_party - Decimal('-411301')) < 1000,
+            'own_funds': abs(own_funds - Decimal('-9856')) < 1000,
+            'financing': abs(financing - Decimal('-421157')) < 1000,
+            'total': abs(total - Decimal('-617794')) < 1000,
+        }
+
+        if verbose:
+            print(f"\n" + "=" * 80)
+            print("CALCULATED CASH FLOW")
+            print("=" * 80)
+
+            print(f"\n🔷 Operating Activities:")
+            print(f"  Profit before adjustments: €{cashflow.operating_activities.start.profit_before_adjustments:,.2f}")
+            print(f"  Expected: €1,765,725")
+
+            print(f"\n  Non-cash adjustments: €{cashflow.operating_activities.non_cash_adjustments.total:,.2f}")
+            print(f"  Expected: €3,386,580")
+
+            print(f"\n  Cashflow before WC: €{cashflow.operating_activities.cashflow_before_wc:,.2f}")
+            print(f"  Expected: €5,152,305")
+
+            print(f"\n  WC changes total: €{cashflow.operating_activities.working_capital_changes.total:,.2f}")
+            print(f"  Expected: €3,467,353")
+
+            print(f"\n  Cashflow after WC: €{cashflow.operating_activities.cashflow_after_wc:,.2f}")
+            print(f"  Expected: €8,619,658")
+
+            print(f"\n  Cash adjustments: €{cashflow.operating_activities.cash_adjustments.total:,.2f}")
+            print(f"  Expected: €-2,029,211")
+
+            print(f"\n  ✅ Total Operating: €{operating:,.2f}")
+            print(f"  Expected: €6,590,447")
+            print(f"  Match: {matches['operating']}")
+
+            print(f"\n🔷 Investing Activities:")
+            print(f"  Total Investing: €{investing:,.2f}")
+            print(f"  Expected: €-6,787,084")
+            print(f"  Match: {matches['investing']}")
+
+            print(f"\n🔷 Financing Activities:")
+            print(f"  Third-party funds: €{third_party:,.2f}")
+            print(f"  Expected: €-411,301")
+            print(f"  Match: {matches['third_party_funds']}")
+
+            print(f"\n  Own funds: €{own_funds:,.2f}")
+            print(f"  Expected: €-9,856")
+            print(f"  Match: {matches['own_funds']}")
+
+            print(f"\n  ✅ Total Financing: €{financing:,.2f}")
+            print(f"  Expected: €-421,157")
+            print(f"  Match: {matches['financing']}")
+
+            print(f"\n🔷 Final Cash Flow:")
+            print(f"  Total: €{total:,.2f}")
+            print(f"  Expected: €-617,794")
+            print(f"  Match: {matches['total']}")
+
+            # Check if there are issues
+            if not matches['total']:
+                print(f"\n❌ CASH FLOW MISMATCH!")
+                print(f"   Difference: €{abs(total - Decimal('-617794')):,.2f}")
+
+        return {
+            'delta_equity': delta_equity,
+            'delta_debt': delta_debt,
+            'total_operating_cashflow': operating,
+            'total_investing_cashflow': investing,
+            'total_financing_cashflow': financing,
+            'total_cashflow': total,
+            'matches': matches,
+        }
 
     finally:
         db.close()
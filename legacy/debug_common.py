@@ -0,0 +1,57 @@
+"""
+Debug Common - Shared parsing state for the XBRL debug scripts
+"""
+import os
+from functools import lru_cache
+
+from importers.xbrl_parser_enhanced import EnhancedXBRLParser
+
+
+@lru_cache(maxsize=8192)
+def local(tag):
+    """Local name of a fact tag (memoized: the same tags repeat across years)"""
+    return tag.rpartition('}')[2] if tag.startswith('{') else tag.rpartition(':')[2]
+
+
+def load(xbrl_file, streaming=False, years=None):
+    """
+    Parse an XBRL file once per session
+
+    With streaming=True the file is read with parser.parse_file_streaming,
+    which never holds the whole DOM; root is then None. If years is given,
+    only facts for those years are returned.
+
+    Returns:
+        Tuple of (parser, root, contexts, facts_by_year); later calls with the
+        same arguments return the same objects, so callers must not mutate them
+    """
+    return _load(os.path.abspath(xbrl_file), streaming, frozenset(years) if years is not None else None)
+
+
+@lru_cache(maxsize=None)
+def _load(path, streaming, years):
+    parser = EnhancedXBRLParser()
+    if streaming:
+        contexts, facts_by_year = parser.parse_file_streaming(path, years=years)
+        return parser, None, contexts, facts_by_year
+
+    root = parser.parse_file(path)
+    contexts = parser.extract_contexts(root)
+    facts_by_year = parser.extract_facts(root, contexts)
+    if years is not None:
+        facts_by_year = {y: f for y, f in facts_by_year.items() if y in years}
+    return parser, root, contexts, facts_by_year
+
+
+# Full mappings already computed in this session, keyed by id() of the facts
+# dict; the dict itself is kept alongside so a recycled id can't give a stale hit
+_mapping_cache = {}
+
+
+def mapped(parser, facts):
+    """Memoized parser.map_facts_to_fields_with_reconciliation(facts)"""
+    entry = _mapping_cache.get(id(facts))
+    if entry is None or entry[0] is not facts:
+        entry = (facts, parser.map_facts_to_fields_with_reconciliation(facts))
+        _mapping_cache[id(facts)] = entry
+    return entry[1]
@@ -5,10 +5,12 @@ import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'backend'))
 
-from lxml import etree
+import re
 from decimal import Decimal
 from importers.xbrl_parser_enhanced import EnhancedXBRLParser
 from datetime import datetime
+from debug_common import local
+
 
 # Find the XBRL file
 import glob
@@ -72,13 +74,12 @@ for year in sorted(facts_by_year.keys()):
         'UtiliPerditeCambi',
         'Imposte'
     ]
+    income_tags_re = re.compile('|'.join(map(re.escape, income_tags_to_check)))
 
-    for tag in duration_facts.keys():
-        local_name = etree.QName(tag).localname if tag.startswith('{') else tag.split(':')[-1]
-        for check_tag in income_tags_to_check:
-            if check_tag in local_name:
-                income_tags_found.append((local_name, duration_facts[tag]))
-                break
+    for tag, value in duration_facts.items():
+        local_name = local(tag)
+        if income_tags_re.search(local_name):
+            income_tags_found.append((local_name, value))
 
     if income_tags_found:
         print(f"\n  Income statement tags in duration facts:")
@@ -88,7 +89,6 @@ for year in sorted(facts_by_year.keys()):
         print(f"\n  WARNING: No income statement tags found in duration facts!")
         print(f"\n  Sample duration fact tags (first 10):")
         for i, tag in enumerate(list(duration_facts.keys())[:10]):
-            local_name = etree.QName(tag).localname if tag.startswith('{') else tag.split(':')[-1]
-            print(f"    {local_name}: {duration_facts[tag]}")
+            print(f"    {local(tag)}: {duration_facts[tag]}")
 
 print("\n=== DONE ===")
@@ -3,24 +3,51 @@
 Migration Script - Update Budget Tables Schema
 This script drops and recreates budget-related tables to match the new schema
 """
-from database.db import SessionLocal, engine, Base
+from database.db import engine, Base
 from database.models import (
     BudgetScenario, BudgetAssumptions, ForecastYear,
     ForecastBalanceSheet, ForecastIncomeStatement
 )
-from sqlalchemy import inspect, text
+from sqlalchemy import inspect
 
-def migrate_budget_tables():
-    """Drop and recreate budget tables with updated schema"""
+BUDGET_MODEL_TABLES = [
+    BudgetScenario.__table__,
+    BudgetAssumptions.__table__,
+    ForecastYear.__table__,
+    ForecastBalanceSheet.__table__,
+    ForecastIncomeStatement.__table__
+]
+
+
+def budget_schema_up_to_date(inspector=None):
+    """Check whether every budget table exists with the model's column names and types"""
+    inspector = inspector or inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in BUDGET_MODEL_TABLES:
+        if table.name not in existing_tables:
+            return False
+        expected_cols = {c.name: str(c.type) for c in table.columns}
+        actual_cols = {c['name']: str(c['type']) for c in inspector.get_columns(table.name)}
+        if expected_cols != actual_cols:
+            return False
+
+    return True
 
-    print("🔄 Starting budget tables migration...")
 
-    # Get database session
-    db = SessionLocal()
+def migrate_budget_tables(force=False):
+    """Drop and recreate budget tables with updated schema (skipped if already current, unless force)"""
+
+    print("🔄 Starting budget tables migration...")
 
     try:
         # Check which tables exist
         inspector = inspect(engine)
+
+        if not force and budget_schema_up_to_date(inspector):
+            print("\n✅ Budget tables schema is already up-to-date, nothing to do.")
+            return
+
         existing_tables = inspector.get_table_names()
 
         budget_tables = [
@@ -31,30 +58,25 @@ def migrate_budget_tables():
             'budget_scenarios'
         ]
 
-        # Drop budget tables in correct order (respecting foreign keys)
-        print("\n📋 Dropping old budget tables...")
-        for table in budget_tables:
-            if table in existing_tables:
-                print(f"   - Dropping {table}...")
-                db.execute(text(f"DROP TABLE IF EXISTS {table}"))
-                db.commit()
-
-        print("\n✅ Old tables dropped successfully")
-
-        # Create new tables with updated schema
-        print("\n📊 Creating new budget tables with updated schema...")
-
-        # Create only the budget-related tables
-        Base.metadata.create_all(
-            engine,
-            tables=[
-                BudgetScenario.__table__,
-                BudgetAssumptions.__table__,
-                ForecastYear.__table__,
-                ForecastBalanceSheet.__table__,
-                ForecastIncomeStatement.__table__
-            ]
-        )
+        # Drop and recreate in a single transaction: one commit, and a failed
+        # CREATE rolls back the DROPs as well. pysqlite doesn't open a
+        # transaction before DDL on its own, so BEGIN is issued explicitly.
+        with engine.begin() as conn:
+            conn.exec_driver_sql("BEGIN")
+            # drop_all orders the DROPs by foreign key dependencies
+            print("\n📋 Dropping old budget tables...")
+            for table in budget_tables:
+                if table in existing_tables:
+                    print(f"   - Dropping {table}...")
+            Base.metadata.drop_all(conn, tables=BUDGET_MODEL_TABLES)
+
+            print("\n✅ Old tables dropped successfully")
+
+            # Create new tables with updated schema
+            print("\n📊 Creating new budget tables with updated schema...")
+
+            # Create only the budget-related tables
+            Base.metadata.create_all(conn, tables=BUDGET_MODEL_TABLES)
 
         print("\n✅ New tables created successfully!")
         print("\n📝 Updated tables:")
@@ -67,22 +89,23 @@ def migrate_budget_tables():
 
     except Exception as e:
         print(f"\n❌ Error during migration: {e}")
-        db.rollback()
         raise
-    finally:
-        db.close()
-
 
 if __name__ == "__main__":
     print("=" * 70)
     print("BUDGET TABLES MIGRATION")
     print("=" * 70)
-    print("\n⚠️  WARNING: This will delete all existing budget scenarios!")
-    print("   Company data and historical financials will NOT be affected.")
-
-    response = input("\n❓ Continue with migration? (yes/no): ").lower().strip()
 
-    if response == 'yes':
-        migrate_budget_tables()
+    # Only ask for confirmation when there is something to change
+    if budget_schema_up_to_date():
+        print("\n✅ Budget tables schema is already up-to-date, nothing to do.")
     else:
-        print("\n❌ Migration cancelled.")
+        print("\n⚠️  WARNING: This will delete all existing budget scenarios!")
+        print("   Company data and historical financials will NOT be affected.")
+
+        response = input("\n❓ Continue with migration? (yes/no): ").lower().strip()
+
+        if response == 'yes':
+            migrate_budget_tables(force=True)
+        else:
+            print("\n❌ Migration cancelled.")
@@ -3,200 +3,156 @@
 Database Migration Script - Add Hierarchical Debt and Depreciation Fields
 Adds detailed debt breakdown fields and depreciation split fields
 """
+import re
 import sys
 from sqlalchemy import text
 from database.db import SessionLocal
 
+# Debt breakdown fields (financial: banks / other lenders / bonds; operating:
+# suppliers / tax / social security / other), short and long term
+DEBT_COLS = (
+    "sp16a_debiti_banche_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17a_debiti_banche_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16b_debiti_altri_finanz_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17b_debiti_altri_finanz_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16c_debiti_obbligazioni_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17c_debiti_obbligazioni_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16d_debiti_fornitori_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17d_debiti_fornitori_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16e_debiti_tributari_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17e_debiti_tributari_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16f_debiti_previdenza_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17f_debiti_previdenza_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp16g_altri_debiti_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "sp17g_altri_debiti_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+)
+
+# Depreciation split fields
+DEPR_COLS = (
+    "ce09a_ammort_immateriali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "ce09b_ammort_materiali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+    "ce09c_svalutazioni NUMERIC(15, 2) DEFAULT 0 NOT NULL",
+)
+
+# (table, column definitions) in the order they are migrated
+MIGRATIONS = (
+    ("balance_sheets", DEBT_COLS),
+    ("forecast_balance_sheets", DEBT_COLS),
+    ("income_statements", DEPR_COLS),
+    ("forecast_income_statements", DEPR_COLS),
+)
+
+# Recorded in schema_migrations once the migration has run, so re-runs are no-ops
+MIGRATION_VERSION = "hierarchical_debts_v1"
+
+# Connection settings for the duration of the migration: temporary b-trees in
+# memory and fewer fsyncs. The rollback journal is left alone, so a crash
+# cannot corrupt the database; NORMAL only gives up durability of the last
+# commit on power loss. These are per-connection and the connection goes back
+# to the pool, so the previous values are restored afterwards.
+FAST_DDL_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "temp_store": "MEMORY",
+}
+
+# Report separator
+SEP80 = "=" * 80
+
+
+def _missing_columns(table_sql, column_defs):
+    """Column definitions from column_defs that table_sql (its CREATE TABLE) lacks"""
+    existing_cols = set(re.findall(r'\w+', table_sql))
+    return [f for f in column_defs if f.split()[0] not in existing_cols]
+
+
 def migrate_add_hierarchical_fields():
     """Add hierarchical debt and depreciation fields to existing tables"""
     db = SessionLocal()
+    saved_pragmas = {}
 
     try:
-        print("=" * 80)
-        print("DATABASE MIGRATION: Adding Hierarchical Debt and Depreciation Fields")
-        print("=" * 80)
-
-        # Check which tables exist
-        result = db.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
-        tables = [row[0] for row in result.fetchall()]
-
-        print(f"\n✓ Found {len(tables)} tables in database")
-
-        # === BALANCE SHEETS TABLE ===
-        if 'balance_sheets' in tables:
-            print("\n📊 Migrating balance_sheets table...")
-
-            # Check if new fields already exist
-            result = db.execute(text("PRAGMA table_info(balance_sheets)"))
-            columns = [row[1] for row in result.fetchall()]
-
-            fields_to_add = []
-
-            # Financial debt fields
-            if 'sp16a_debiti_banche_breve' not in columns:
-                fields_to_add.extend([
-                    "sp16a_debiti_banche_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17a_debiti_banche_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16b_debiti_altri_finanz_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17b_debiti_altri_finanz_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16c_debiti_obbligazioni_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17c_debiti_obbligazioni_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            # Operating debt fields
-            if 'sp16d_debiti_fornitori_breve' not in columns:
-                fields_to_add.extend([
-                    "sp16d_debiti_fornitori_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17d_debiti_fornitori_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16e_debiti_tributari_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17e_debiti_tributari_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16f_debiti_previdenza_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17f_debiti_previdenza_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16g_altri_debiti_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17g_altri_debiti_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            if fields_to_add:
-                for field in fields_to_add:
-                    try:
-                        sql = f"ALTER TABLE balance_sheets ADD COLUMN {field}"
-                        db.execute(text(sql))
-                        print(f"   ✓ Added {field.split()[0]}")
-                    except Exception as e:
-                        print(f"   ⚠ Skipping {field.split()[0]}: {str(e)}")
-
-                db.commit()
-                print(f"   ✓ Added {len(fields_to_add)} new fields to balance_sheets")
-            else:
-                print("   ✓ All fields already exist in balance_sheets")
-
-        # === FORECAST BALANCE SHEETS TABLE ===
-        if 'forecast_balance_sheets' in tables:
-            print("\n📊 Migrating forecast_balance_sheets table...")
-
-            result = db.execute(text("PRAGMA table_info(forecast_balance_sheets)"))
-            columns = [row[1] for row in result.fetchall()]
-
-            fields_to_add = []
-
-            # Financial debt fields
-            if 'sp16a_debiti_banche_breve' not in columns:
-                fields_to_add.extend([
-                    "sp16a_debiti_banche_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17a_debiti_banche_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16b_debiti_altri_finanz_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17b_debiti_altri_finanz_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16c_debiti_obbligazioni_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17c_debiti_obbligazioni_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            # Operating debt fields
-            if 'sp16d_debiti_fornitori_breve' not in columns:
-                fields_to_add.extend([
-                    "sp16d_debiti_fornitori_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17d_debiti_fornitori_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16e_debiti_tributari_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17e_debiti_tributari_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16f_debiti_previdenza_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17f_debiti_previdenza_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp16g_altri_debiti_breve NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "sp17g_altri_debiti_lungo NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            if fields_to_add:
-                for field in fields_to_add:
-                    try:
-                        sql = f"ALTER TABLE forecast_balance_sheets ADD COLUMN {field}"
-                        db.execute(text(sql))
-                        print(f"   ✓ Added {field.split()[0]}")
-                    except Exception as e:
-                        print(f"   ⚠ Skipping {field.split()[0]}: {str(e)}")
-
-                db.commit()
-                print(f"   ✓ Added {len(fields_to_add)} new fields to forecast_balance_sheets")
-            else:
-                print("   ✓ All fields already exist in forecast_balance_sheets")
-
-        # === INCOME STATEMENTS TABLE ===
-        if 'income_statements' in tables:
-            print("\n📊 Migrating income_statements table...")
-
-            result = db.execute(text("PRAGMA table_info(income_statements)"))
-            columns = [row[1] for row in result.fetchall()]
-
-            fields_to_add = []
-
-            # Depreciation split fields
-            if 'ce09a_ammort_immateriali' not in columns:
-                fields_to_add.extend([
-                    "ce09a_ammort_immateriali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "ce09b_ammort_materiali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "ce09c_svalutazioni NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            if fields_to_add:
-                for field in fields_to_add:
-                    try:
-                        sql = f"ALTER TABLE income_statements ADD COLUMN {field}"
-                        db.execute(text(sql))
-                        print(f"   ✓ Added {field.split()[0]}")
-                    except Exception as e:
-                        print(f"   ⚠ Skipping {field.split()[0]}: {str(e)}")
-
-                db.commit()
-                print(f"   ✓ Added {len(fields_to_add)} new fields to income_statements")
-            else:
-                print("   ✓ All fields already exist in income_statements")
-
-        # === FORECAST INCOME STATEMENTS TABLE ===
-        if 'forecast_income_statements' in tables:
-            print("\n📊 Migrating forecast_income_statements table...")
-
-            result = db.execute(text("PRAGMA table_info(forecast_income_statements)"))
-            columns = [row[1] for row in result.fetchall()]
-
-            fields_to_add = []
-
-            # Depreciation split fields
-            if 'ce09a_ammort_immateriali' not in columns:
-                fields_to_add.extend([
-                    "ce09a_ammort_immateriali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "ce09b_ammort_materiali NUMERIC(15, 2) DEFAULT 0 NOT NULL",
-                    "ce09c_svalutazioni NUMERIC(15, 2) DEFAULT 0 NOT NULL"
-                ])
-
-            if fields_to_add:
-                for field in fields_to_add:
-                    try:
-                        sql = f"ALTER TABLE forecast_income_statements ADD COLUMN {field}"
-                        db.execute(text(sql))
+        # One transaction for the whole migration: a single commit, and a
+        # failure part-way leaves the schema untouched (see the script below)
+        with db.begin():
+            print(SEP80)
+            print("DATABASE MIGRATION: Adding Hierarchical Debt and Depreciation Fields")
+            print(SEP80)
+
+            db.execute(text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations "
+                "(version TEXT PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+            ))
+            applied = db.execute(
+                text("SELECT 1 FROM schema_migrations WHERE version = :version"),
+                {"version": MIGRATION_VERSION}
+            ).first()
+            if applied:
+                print(f"\n✓ Migration {MIGRATION_VERSION} already applied, nothing to do")
+                return
+
+            # Neither setting is tied to the transaction, so they can be
+            # changed here, once we know the migration will run
+            for pragma, value in FAST_DDL_PRAGMAS.items():
+                saved_pragmas[pragma] = db.execute(text(f"PRAGMA {pragma}")).scalar()
+                db.execute(text(f"PRAGMA {pragma} = {value}"))
+
+            # Check which tables exist; the CREATE TABLE text (kept current by
+            # SQLite across ALTERs) tells us which columns each one already has,
+            # so only missing columns are ALTERed and none can already exist
+            result = db.execute(text("SELECT name, sql FROM sqlite_master WHERE type='table'"))
+            schema = {name: sql or '' for name, sql in result}
+
+            print(f"\n✓ Found {len(schema)} tables in database")
+
+            plan = [
+                (table, _missing_columns(schema[table], column_defs))
+                for table, column_defs in MIGRATIONS
+                if table in schema
+            ]
+            stmts = [
+                f"ALTER TABLE {table} ADD COLUMN {field}"
+                for table, fields in plan
+                for field in fields
+            ]
+            stmts.append(f"INSERT INTO schema_migrations (version) VALUES ('{MIGRATION_VERSION}')")
+
+            # Every ALTER plus the version row goes to SQLite as one script in
+            # its own BEGIN/COMMIT, bypassing per-statement SQLAlchemy overhead.
+            # If a statement fails the script stops with that transaction still
+            # open, and leaving db.begin() on the exception rolls it back.
+            raw_conn = db.connection().connection.driver_connection
+            raw_conn.executescript("BEGIN;\n" + ";\n".join(stmts) + ";\nCOMMIT;")
+
+            for table, fields_to_add in plan:
+                print(f"\n📊 Migrating {table} table...")
+                if fields_to_add:
+                    for field in fields_to_add:
                         print(f"   ✓ Added {field.split()[0]}")
-                    except Exception as e:
-                        print(f"   ⚠ Skipping {field.split()[0]}: {str(e)}")
-
-                db.commit()
-                print(f"   ✓ Added {len(fields_to_add)} new fields to forecast_income_statements")
-            else:
-                print("   ✓ All fields already exist in forecast_income_statements")
-
-        print("\n" + "=" * 80)
-        print("✅ Migration completed successfully!")
-        print("=" * 80)
-        print("\nNew fields added:")
-        print("  Balance Sheets:")
-        print("    - sp16a-g_* (short-term debt details)")
-        print("    - sp17a-g_* (long-term debt details)")
-        print("  Income Statements:")
-        print("    - ce09a_ammort_immateriali (intangible depreciation)")
-        print("    - ce09b_ammort_materiali (tangible depreciation)")
-        print("    - ce09c_svalutazioni (write-downs)")
-        print("\n⚠️  IMPORTANT: Re-import XBRL files to populate the new fields!")
+                    print(f"   ✓ Added {len(fields_to_add)} new fields to {table}")
+                else:
+                    print(f"   ✓ All fields already exist in {table}")
+
+            print("\n" + SEP80)
+            print("✅ Migration completed successfully!")
+            print(SEP80)
+            print("\nNew fields added:")
+            print("  Balance Sheets:")
+            print("    - sp16a-g_* (short-term debt details)")
+            print("    - sp17a-g_* (long-term debt details)")
+            print("  Income Statements:")
+            print("    - ce09a_ammort_immateriali (intangible depreciation)")
+            print("    - ce09b_ammort_materiali (tangible depreciation)")
+            print("    - ce09c_svalutazioni (write-downs)")
+            print("\n⚠️  IMPORTANT: Re-import XBRL files to populate the new fields!")
 
     except Exception as e:
         print(f"\n❌ Migration failed: {str(e)}")
-        db.rollback()
         raise
     finally:
+        if saved_pragmas:
+            for pragma, value in saved_pragmas.items():
+                db.execute(text(f"PRAGMA {pragma} = {value}"))
+            db.commit()
         db.close()
 
 
@@ -2,7 +2,6 @@
 Re-import ISTANZA XBRL file to database
 """
 from importers.xbrl_parser_enhanced import import_xbrl_file_enhanced
-import json
 
 
 def main():
@@ -23,23 +22,26 @@ def main():
 
         print(f"\n✅ IMPORT SUCCESSFUL!")
         print(f"\n📊 Results:")
-        print(f"   Company: {result['company_name']}")
-        print(f"   Tax ID: {result['tax_id']}")
-        print(f"   Company ID: {result['company_id']}")
-        print(f"   Taxonomy: {result['taxonomy_version']}")
-        print(f"   Years imported: {result['years']}")
+        company_name, tax_id, company_id, taxonomy_version, years = (
+            result[k] for k in ('company_name', 'tax_id', 'company_id', 'taxonomy_version', 'years')
+        )
+        print(f"   Company: {company_name}")
+        print(f"   Tax ID: {tax_id}")
+        print(f"   Company ID: {company_id}")
+        print(f"   Taxonomy: {taxonomy_version}")
+        print(f"   Years imported: {years}")
         print(f"   Company created: {result.get('company_created', False)}")
 
         # Show reconciliation info
-        if 'reconciliation_info' in result:
-            for year, info in result['reconciliation_info'].items():
-                print(f"\n   Year {year}:")
-                print(f"     Priority matches: {len(info.get('priority_matches', {}))}")
-
-                if info.get('reconciliation_adjustments'):
-                    print(f"     Reconciliation adjustments:")
-                    for category, adj in info['reconciliation_adjustments'].items():
-                        print(f"       {category}: {adj}")
+        for year, info in result.get('reconciliation_info', {}).items():
+            print(f"\n   Year {year}:")
+            print(f"     Priority matches: {len(info.get('priority_matches', {}))}")
+
+            adjustments = info.get('reconciliation_adjustments')
+            if adjustments:
+                print(f"     Reconciliation adjustments:")
+                for category, adj in adjustments.items():
+                    print(f"       {category}: {adj}")
 
         print(f"\n✅ Database updated with correct ISTANZA data!")
         print(f"\n⚠️ NEXT STEPS:")
@@ -0,0 +1,125 @@
+"""
+Forecast Data - cached loaders shared by the forecast pages
+
+The loaders return plain snapshots of the requested statement fields rather
+than ORM objects, so st.cache_data can pickle them and reruns don't go back
+to the database. Anything that changes scenarios or forecast data must call
+st.cache_data.clear() once the change is committed; forecast recalculation
+goes through regenerate_forecast(), which always does.
+"""
+import streamlit as st
+from calculations.forecast_engine import generate_forecast_for_scenario
+from database.models import FinancialYear, BudgetScenario, ForecastYear
+from sqlalchemy.orm import load_only, selectinload
+from types import SimpleNamespace
+
+
+def snapshot(statement, fields):
+    """Plain copy of the given statement fields, or None if there is no statement"""
+    if statement is None:
+        return None
+    return SimpleNamespace(**{f: getattr(statement, f) for f in fields})
+
+
+def _year_snapshot(year_row, inc_fields, bs_fields):
+    """
+    Year number plus snapshots of its statements
+
+    A statement whose field tuple is empty is not loaded and is None.
+    """
+    return SimpleNamespace(
+        year=year_row.year,
+        inc=snapshot(year_row.income_statement, inc_fields) if inc_fields else None,
+        bs=snapshot(year_row.balance_sheet, bs_fields) if bs_fields else None,
+    )
+
+
+def _year_options(model, inc_fields, bs_fields):
+    """
+    Loader options for a year model: only id and year from the year row,
+    which skips the JSON original_*_snapshot columns, plus the statements
+    that have fields to read. Statements are loaded whole, since their
+    totals are computed properties over most of their columns.
+    """
+    options = [load_only(model.id, model.year)]
+    if inc_fields:
+        options.append(selectinload(model.income_statement))
+    if bs_fields:
+        options.append(selectinload(model.balance_sheet))
+    return options
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_scenarios(_db, company_id):
+    """Active scenarios of a company, newest first"""
+    scenarios = _db.query(BudgetScenario).filter(
+        BudgetScenario.company_id == company_id,
+        BudgetScenario.is_active == 1
+    ).order_by(BudgetScenario.created_at.desc()).all()
+    return [SimpleNamespace(id=s.id, name=s.name, base_year=s.base_year) for s in scenarios]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_forecast_years(_db, scenario_id, inc_fields=(), bs_fields=()):
+    """
+    Forecast years of a scenario in chronological order
+
+    Args:
+        _db: Database session (not hashed by the cache)
+        scenario_id: Budget scenario ID
+        inc_fields: Income statement fields to snapshot
+        bs_fields: Balance sheet fields to snapshot
+
+    Returns:
+        List of year snapshots with year, inc and bs attributes
+    """
+    forecast_years = _db.query(ForecastYear).options(
+        *_year_options(ForecastYear, inc_fields, bs_fields)
+    ).filter(
+        ForecastYear.scenario_id == scenario_id
+    ).order_by(ForecastYear.year).all()
+    return [_year_snapshot(fy, inc_fields, bs_fields) for fy in forecast_years]
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def load_historical(_db, company_id, base_year, inc_fields=(), bs_fields=()):
+    """
+    Up to three historical years ending at base_year, in chronological order
+
+    Args:
+        _db: Database session (not hashed by the cache)
+        company_id: Company ID
+        base_year: Last historical year to include
+        inc_fields: Income statement fields to snapshot
+        bs_fields: Balance sheet fields to snapshot
+
+    Returns:
+        List of year snapshots with year, inc and bs attributes
+    """
+    historical_years = _db.query(FinancialYear).options(
+        *_year_options(FinancialYear, inc_fields, bs_fields)
+    ).filter(
+        FinancialYear.company_id == company_id,
+        FinancialYear.year <= base_year
+    ).order_by(FinancialYear.year.desc()).limit(3).all()
+    return [_year_snapshot(hy, inc_fields, bs_fields) for hy in reversed(historical_years)]
+
+
+def regenerate_forecast(scenario_id, db):
+    """
+    Regenerate the forecast of a scenario and clear the cached loaders
+
+    The cache is cleared even if generation fails, so changes the caller
+    committed beforehand (e.g. the scenario itself) still show up.
+
+    Args:
+        scenario_id: Budget scenario ID
+        db: Database session
+
+    Returns:
+        Forecast results from generate_forecast_for_scenario
+    """
+    try:
+        return generate_forecast_for_scenario(scenario_id, db)
+    finally:
+        st.cache_data.clear()
@@ -43,6 +43,7 @@ def show():
             new_bs = BalanceSheet(financial_year_id=fy.id)
             db.add(new_bs)
             db.commit()
+            st.cache_data.clear()
             st.success("✅ Stato Patrimoniale creato!")
             st.rerun()
 
@@ -266,6 +267,7 @@ def show():
                     bs.sp18_ratei_risconti_passivi = Decimal(str(sp18))
 
                     db.commit()
+                    st.cache_data.clear()
                     st.success("✅ Stato Patrimoniale aggiornato!")
                     st.rerun()
 
@@ -6,7 +6,7 @@ import streamlit as st
 from database.models import (
     Company, FinancialYear, BudgetScenario, BudgetAssumptions
 )
-from calculations.forecast_engine import generate_forecast_for_scenario
+from ui.forecast_data import regenerate_forecast
 from decimal import Decimal
 
 
@@ -879,7 +879,7 @@ def _show_scenario_form(db, company, scenario=None, all_scenarios=None):
 
                     # Generate forecast
                     with st.spinner("Calcolo del previsionale in corso..."):
-                        result = generate_forecast_for_scenario(scenario.id, db)
+                        result = regenerate_forecast(scenario.id, db)
 
                     st.success(f"✅ Scenario salvato e previsionale calcolato per {result['years_generated']} anni!")
                     st.balloons()
@@ -979,7 +979,7 @@ def show():
                         if st.button("🔄 Ricalcola", key=f"calc_{scenario.id}", use_container_width=True):
                             try:
                                 with st.spinner("Calcolo in corso..."):
-                                    result = generate_forecast_for_scenario(scenario.id, db)
+                                    result = regenerate_forecast(scenario.id, db)
                                 st.success(f"✅ Previsionale calcolato per {result['years_generated']} anni!")
                                 st.rerun()
                             except Exception as e:
@@ -988,6 +988,7 @@ def show():
                         if st.button("🗑️ Elimina", key=f"del_{scenario.id}", use_container_width=True):
                             db.delete(scenario)
                             db.commit()
+                            st.cache_data.clear()
                             st.success("✅ Scenario eliminato")
                             st.rerun()
 
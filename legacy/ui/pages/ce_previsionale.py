@@ -5,8 +5,26 @@ Display forecasted income statements with historical comparison
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from database.models import Company, FinancialYear, BudgetScenario, ForecastYear
-from decimal import Decimal
+from ui.forecast_data import (
+    load_scenarios, load_forecast_years, load_historical, regenerate_forecast
+)
+from ui.statement_tables import INC_TABLE_ROWS, statement_table
+
+
+# The shared income statement rows plus financial charges and taxes
+CE_TABLE_ROWS = INC_TABLE_ROWS[:-1] + (
+    ("Oneri finanziari", 'ce15_oneri_finanziari'),
+    ("Imposte", 'ce20_imposte'),
+) + INC_TABLE_ROWS[-1:]
+
+# Income statement fields read by this page, snapshotted by the ui.forecast_data loaders
+INC_FIELDS = (
+    'ce01_ricavi_vendite', 'ce04_altri_ricavi', 'ce05_materie_prime',
+    'ce06_servizi', 'ce07_godimento_beni', 'ce08_costi_personale',
+    'ce09_ammortamenti', 'ce12_oneri_diversi', 'ce15_oneri_finanziari',
+    'ce20_imposte', 'production_value', 'production_cost', 'revenue',
+    'ebitda', 'ebit', 'net_profit',
+)
 
 
 def show():
@@ -21,15 +39,10 @@ def show():
         st.warning("⚠️ Seleziona un'azienda in alto")
         return
 
-    company = db.query(Company).filter(
-        Company.id == st.session_state.selected_company_id
-    ).first()
+    company_id = st.session_state.selected_company_id
 
     # Get all active scenarios for this company
-    scenarios = db.query(BudgetScenario).filter(
-        BudgetScenario.company_id == company.id,
-        BudgetScenario.is_active == 1
-    ).order_by(BudgetScenario.created_at.desc()).all()
+    scenarios = load_scenarios(db, company_id)
 
     if not scenarios:
         st.info("📝 Nessuno scenario attivo trovato. Crea uno scenario nella sezione 'Input Ipotesi'")
@@ -43,20 +56,17 @@ def show():
     )
 
     scenario_id = scenario_options[selected_scenario_name]
-    scenario = db.query(BudgetScenario).filter(BudgetScenario.id == scenario_id).first()
+    scenario = next(s for s in scenarios if s.id == scenario_id)
 
     # Get forecast years
-    forecast_years = db.query(ForecastYear).filter(
-        ForecastYear.scenario_id == scenario_id
-    ).order_by(ForecastYear.year).all()
+    forecast_years = load_forecast_years(db, scenario_id, inc_fields=INC_FIELDS)
 
     if not forecast_years:
         st.warning("⚠️ Nessun dato previsionale trovato. Calcola lo scenario nella sezione 'Input Ipotesi'.")
 
         # Add recalculate button
         if st.button("🔄 Ricalcola Scenario"):
-            from calculations.forecast_engine import generate_forecast_for_scenario
-            result = generate_forecast_for_scenario(scenario_id, db)
+            result = regenerate_forecast(scenario_id, db)
             if result:
                 st.success("✅ Scenario ricalcolato con successo!")
                 st.rerun()
@@ -65,11 +75,7 @@ def show():
         return
 
     # Get actual historical data
-    historical_years = db.query(FinancialYear).filter(
-        FinancialYear.company_id == company.id,
-        FinancialYear.year <= scenario.base_year
-    ).order_by(FinancialYear.year.desc()).limit(3).all()
-    historical_years.reverse()  # Chronological order
+    historical_years = load_historical(db, company_id, scenario.base_year, inc_fields=INC_FIELDS)
 
     st.markdown("---")
 
@@ -79,61 +85,33 @@ def show():
 
     # Historical data
     for hy in historical_years:
-        if hy.income_statement:
+        if hy.inc:
             headers.append(f"{hy.year} (Storico)")
             years_data.append({
                 'year': hy.year,
                 'type': 'Storico',
-                'inc': hy.income_statement
+                'inc': hy.inc
             })
 
     # Forecast data
     for fy in forecast_years:
-        if fy.income_statement:
+        if fy.inc:
             headers.append(f"{fy.year} (Budget)")
             years_data.append({
                 'year': fy.year,
                 'type': 'Budget',
-                'inc': fy.income_statement
+                'inc': fy.inc
             })
 
     # Build income statement table
     if years_data:
         st.subheader("📊 Conto Economico - Dati Storici e Previsionali")
 
-        rows = [
-            {"Voce": "A) Valore della produzione", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-            {"Voce": "  Ricavi vendite", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce01_ricavi_vendite for yd in years_data}},
-            {"Voce": "  Altri ricavi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce04_altri_ricavi for yd in years_data}},
-            {"Voce": "  TOTALE VALORE PRODUZIONE", **{f"{yd['year']} ({yd['type']})": yd['inc'].production_value for yd in years_data}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-            {"Voce": "B) Costi della produzione", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-            {"Voce": "  Materie prime", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce05_materie_prime for yd in years_data}},
-            {"Voce": "  Servizi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce06_servizi for yd in years_data}},
-            {"Voce": "  Godimento beni terzi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce07_godimento_beni for yd in years_data}},
-            {"Voce": "  Costi personale", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce08_costi_personale for yd in years_data}},
-            {"Voce": "  Ammortamenti", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce09_ammortamenti for yd in years_data}},
-            {"Voce": "  Oneri diversi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce12_oneri_diversi for yd in years_data}},
-            {"Voce": "  TOTALE COSTI PRODUZIONE", **{f"{yd['year']} ({yd['type']})": yd['inc'].production_cost for yd in years_data}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-            {"Voce": "EBITDA", **{f"{yd['year']} ({yd['type']})": yd['inc'].ebitda for yd in years_data}},
-            {"Voce": "EBIT", **{f"{yd['year']} ({yd['type']})": yd['inc'].ebit for yd in years_data}},
-            {"Voce": "Oneri finanziari", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce15_oneri_finanziari for yd in years_data}},
-            {"Voce": "Imposte", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce20_imposte for yd in years_data}},
-            {"Voce": "Risultato Netto", **{f"{yd['year']} ({yd['type']})": yd['inc'].net_profit for yd in years_data}},
-        ]
-
-        df_inc = pd.DataFrame(rows)
-
-        # Format numeric columns
-        for col in df_inc.columns:
-            if col != "Voce":
-                df_inc[col] = df_inc[col].apply(
-                    lambda x: f"€{x:,.0f}" if isinstance(x, Decimal) and x != "" else x
-                )
+        columns = {f"{yd['year']} ({yd['type']})": yd['inc'] for yd in years_data}
+        styled_inc = statement_table(CE_TABLE_ROWS, columns)
 
         st.dataframe(
-            df_inc,
+            styled_inc,
             hide_index=True,
             use_container_width=True,
             height=600
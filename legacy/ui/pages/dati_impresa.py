@@ -144,6 +144,7 @@ def show():
                             try:
                                 db.delete(company)
                                 db.commit()
+                                st.cache_data.clear()
                                 st.success("✅ Azienda eliminata")
                                 st.session_state.selected_company_id = None
                                 st.session_state.confirm_delete = False
@@ -3,11 +3,80 @@ Forecast View Page
 Display forecasted financial statements
 """
 import streamlit as st
+import numpy as np
 import pandas as pd
-from database.models import (
-    Company, FinancialYear, BudgetScenario, ForecastYear
+from collections import namedtuple
+from ui.forecast_data import load_scenarios, load_forecast_years, load_historical
+from ui.statement_tables import INC_TABLE_ROWS, statement_table
+
+# Statement fields read by this page, snapshotted by the ui.forecast_data loaders
+INC_FIELDS = (
+    'ce01_ricavi_vendite', 'ce04_altri_ricavi', 'production_value',
+    'ce05_materie_prime', 'ce06_servizi', 'ce07_godimento_beni',
+    'ce08_costi_personale', 'ce09_ammortamenti', 'ce12_oneri_diversi',
+    'production_cost', 'ebitda', 'ebit', 'net_profit', 'revenue',
 )
-from decimal import Decimal
+BS_FIELDS = (
+    'fixed_assets', 'current_assets', 'sp06_crediti_breve', 'sp07_crediti_lungo',
+    'sp09_disponibilita_liquide', 'total_assets', 'total_equity', 'total_debt',
+    'sp16_debiti_breve', 'sp17_debiti_lungo', 'total_liabilities', 'current_liabilities',
+)
+
+# Balance sheet table rows, in the ui.statement_tables row format
+BS_TABLE_ROWS = (
+    ("ATTIVO", None),
+    ("Immobilizzazioni", 'fixed_assets'),
+    ("Attivo Corrente", 'current_assets'),
+    ("  - Crediti", lambda bs: bs.sp06_crediti_breve + bs.sp07_crediti_lungo),
+    ("  - Liquidità", 'sp09_disponibilita_liquide'),
+    ("TOTALE ATTIVO", 'total_assets'),
+    ("", None),
+    ("PASSIVO", None),
+    ("Patrimonio Netto", 'total_equity'),
+    ("Debiti", 'total_debt'),
+    ("  - Debiti Breve", 'sp16_debiti_breve'),
+    ("  - Debiti Lungo", 'sp17_debiti_lungo'),
+    ("TOTALE PASSIVO", 'total_liabilities'),
+)
+
+
+# Chart series as (series name, field)
+INC_CHART_SERIES = (
+    ('Ricavi', 'revenue'),
+    ('EBITDA', 'ebitda'),
+    ('EBIT', 'ebit'),
+    ('Utile Netto', 'net_profit'),
+)
+BS_CHART_SERIES = (
+    ('Totale Attivo', 'total_assets'),
+    ('Patrimonio Netto', 'total_equity'),
+    ('Debiti Totali', 'total_debt'),
+)
+
+# A year column of the page: table header, chart axis label and the statements
+YearCol = namedtuple('YearCol', ['label', 'chart_label', 'inc', 'bs'])
+
+
+def _chart_table(series, columns):
+    """
+    Build chart data column by column
+
+    Args:
+        series: (series name, field) pairs, see INC_CHART_SERIES
+        columns: Chart label -> statement snapshot
+
+    Returns:
+        DataFrame with an "Anno" column followed by one float column per series
+    """
+    data = {"Anno": list(columns)}
+    for name, field in series:
+        data[name] = [float(getattr(statement, field)) for statement in columns.values()]
+    return pd.DataFrame(data)
+
+
+def _float_array(values):
+    """Decimal amounts as a float64 array"""
+    return np.array([float(v) for v in values], dtype=np.float64)
 
 
 def show():
@@ -22,15 +91,10 @@ def show():
         st.warning("⚠️ Seleziona un'azienda in alto")
         return
 
-    company = db.query(Company).filter(
-        Company.id == st.session_state.selected_company_id
-    ).first()
+    company_id = st.session_state.selected_company_id
 
     # Get all active scenarios for this company
-    scenarios = db.query(BudgetScenario).filter(
-        BudgetScenario.company_id == company.id,
-        BudgetScenario.is_active == 1
-    ).order_by(BudgetScenario.created_at.desc()).all()
+    scenarios = load_scenarios(db, company_id)
 
     if not scenarios:
         st.info("📝 Nessuno scenario attivo trovato. Crea uno scenario nella sezione 'Budget & Previsionale'")
@@ -44,26 +108,27 @@ def show():
     )
 
     scenario_id = scenario_options[selected_scenario_name]
-    scenario = db.query(BudgetScenario).filter(BudgetScenario.id == scenario_id).first()
+    scenario = next(s for s in scenarios if s.id == scenario_id)
 
     # Get forecast years
-    forecast_years = db.query(ForecastYear).filter(
-        ForecastYear.scenario_id == scenario_id
-    ).order_by(ForecastYear.year).all()
+    forecast_years = load_forecast_years(db, scenario_id, INC_FIELDS, BS_FIELDS)
 
     if not forecast_years:
         st.warning("⚠️ Nessun dato previsionale trovato. Ricalcola lo scenario.")
         return
 
     # Get actual historical data
-    historical_years = db.query(FinancialYear).filter(
-        FinancialYear.company_id == company.id,
-        FinancialYear.year <= scenario.base_year
-    ).order_by(FinancialYear.year.desc()).limit(3).all()
-    historical_years.reverse()  # Chronological order
+    historical_years = load_historical(db, company_id, scenario.base_year, INC_FIELDS, BS_FIELDS)
 
     st.markdown("---")
 
+    # One column per year, historical first, with labels built once for all tabs
+    year_cols = [
+        YearCol(f"{y.year} ({kind})", f"{y.year}\n({kind})", y.inc, y.bs)
+        for kind, rows in (('Storico', historical_years), ('Budget', forecast_years))
+        for y in rows
+    ]
+
     # Tabs for different views
     tab1, tab2, tab3 = st.tabs(["📊 Conto Economico", "💼 Stato Patrimoniale", "📈 Indici"])
 
@@ -71,190 +136,77 @@ def show():
         # Income Statement view
         st.subheader("Conto Economico - Dati Storici e Previsionali")
 
-        # Collect data for table
-        years_data = []
-        headers = ["Voce"]
-
-        # Historical data
-        for hy in historical_years:
-            if hy.income_statement:
-                headers.append(f"{hy.year} (Storico)")
-                years_data.append({
-                    'year': hy.year,
-                    'type': 'Storico',
-                    'inc': hy.income_statement
-                })
-
-        # Forecast data
-        for fy in forecast_years:
-            if fy.income_statement:
-                headers.append(f"{fy.year} (Budget)")
-                years_data.append({
-                    'year': fy.year,
-                    'type': 'Budget',
-                    'inc': fy.income_statement
-                })
+        years_data = [yc for yc in year_cols if yc.inc]
 
         # Build income statement table
         if years_data:
-            rows = [
-                {"Voce": "A) Valore della produzione", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-                {"Voce": "  Ricavi vendite", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce01_ricavi_vendite for yd in years_data}},
-                {"Voce": "  Altri ricavi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce04_altri_ricavi for yd in years_data}},
-                {"Voce": "  TOTALE VALORE PRODUZIONE", **{f"{yd['year']} ({yd['type']})": yd['inc'].production_value for yd in years_data}},
-                {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-                {"Voce": "B) Costi della produzione", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-                {"Voce": "  Materie prime", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce05_materie_prime for yd in years_data}},
-                {"Voce": "  Servizi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce06_servizi for yd in years_data}},
-                {"Voce": "  Godimento beni terzi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce07_godimento_beni for yd in years_data}},
-                {"Voce": "  Costi personale", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce08_costi_personale for yd in years_data}},
-                {"Voce": "  Ammortamenti", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce09_ammortamenti for yd in years_data}},
-                {"Voce": "  Oneri diversi", **{f"{yd['year']} ({yd['type']})": yd['inc'].ce12_oneri_diversi for yd in years_data}},
-                {"Voce": "  TOTALE COSTI PRODUZIONE", **{f"{yd['year']} ({yd['type']})": yd['inc'].production_cost for yd in years_data}},
-                {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data}},
-                {"Voce": "EBITDA", **{f"{yd['year']} ({yd['type']})": yd['inc'].ebitda for yd in years_data}},
-                {"Voce": "EBIT", **{f"{yd['year']} ({yd['type']})": yd['inc'].ebit for yd in years_data}},
-                {"Voce": "Risultato Netto", **{f"{yd['year']} ({yd['type']})": yd['inc'].net_profit for yd in years_data}},
-            ]
-
-            df_inc = pd.DataFrame(rows)
-
-            # Format numeric columns
-            for col in df_inc.columns:
-                if col != "Voce":
-                    df_inc[col] = df_inc[col].apply(
-                        lambda x: f"€{x:,.0f}" if isinstance(x, Decimal) and x != "" else x
-                    )
+            styled_inc = statement_table(INC_TABLE_ROWS, {yc.label: yc.inc for yc in years_data})
 
             st.dataframe(
-                df_inc,
+                styled_inc,
                 hide_index=True,
                 use_container_width=True
             )
 
             # Chart
             st.markdown("### 📊 Trend Ricavi e Margini")
-            chart_data = []
-            for yd in years_data:
-                chart_data.append({
-                    'Anno': f"{yd['year']}\n({yd['type']})",
-                    'Ricavi': float(yd['inc'].revenue),
-                    'EBITDA': float(yd['inc'].ebitda),
-                    'EBIT': float(yd['inc'].ebit),
-                    'Utile Netto': float(yd['inc'].net_profit)
-                })
-
-            df_chart = pd.DataFrame(chart_data)
-            st.line_chart(df_chart, x='Anno', y=['Ricavi', 'EBITDA', 'EBIT', 'Utile Netto'])
+            df_chart = _chart_table(INC_CHART_SERIES, {yc.chart_label: yc.inc for yc in years_data})
+            st.line_chart(df_chart, x='Anno', y=[name for name, _ in INC_CHART_SERIES])
 
     with tab2:
         # Balance Sheet view
         st.subheader("Stato Patrimoniale - Dati Storici e Previsionali")
 
-        # Collect data for table
-        years_data_bs = []
-
-        # Historical data
-        for hy in historical_years:
-            if hy.balance_sheet:
-                years_data_bs.append({
-                    'year': hy.year,
-                    'type': 'Storico',
-                    'bs': hy.balance_sheet
-                })
-
-        # Forecast data
-        for fy in forecast_years:
-            if fy.balance_sheet:
-                years_data_bs.append({
-                    'year': fy.year,
-                    'type': 'Budget',
-                    'bs': fy.balance_sheet
-                })
+        years_data_bs = [yc for yc in year_cols if yc.bs]
 
         # Build balance sheet table
         if years_data_bs:
-            rows = [
-                {"Voce": "ATTIVO", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-                {"Voce": "Immobilizzazioni", **{f"{yd['year']} ({yd['type']})": yd['bs'].fixed_assets for yd in years_data_bs}},
-                {"Voce": "Attivo Corrente", **{f"{yd['year']} ({yd['type']})": yd['bs'].current_assets for yd in years_data_bs}},
-                {"Voce": "  - Crediti", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp06_crediti_breve + yd['bs'].sp07_crediti_lungo for yd in years_data_bs}},
-                {"Voce": "  - Liquidità", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp09_disponibilita_liquide for yd in years_data_bs}},
-                {"Voce": "TOTALE ATTIVO", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_assets for yd in years_data_bs}},
-                {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-                {"Voce": "PASSIVO", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-                {"Voce": "Patrimonio Netto", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_equity for yd in years_data_bs}},
-                {"Voce": "Debiti", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_debt for yd in years_data_bs}},
-                {"Voce": "  - Debiti Breve", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp16_debiti_breve for yd in years_data_bs}},
-                {"Voce": "  - Debiti Lungo", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp17_debiti_lungo for yd in years_data_bs}},
-                {"Voce": "TOTALE PASSIVO", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_liabilities for yd in years_data_bs}},
-            ]
-
-            df_bs = pd.DataFrame(rows)
-
-            # Format numeric columns
-            for col in df_bs.columns:
-                if col != "Voce":
-                    df_bs[col] = df_bs[col].apply(
-                        lambda x: f"€{x:,.0f}" if isinstance(x, Decimal) and x != "" else x
-                    )
+            styled_bs = statement_table(BS_TABLE_ROWS, {yc.label: yc.bs for yc in years_data_bs})
 
             st.dataframe(
-                df_bs,
+                styled_bs,
                 hide_index=True,
                 use_container_width=True
             )
 
             # Chart
             st.markdown("### 📊 Trend Patrimoniale")
-            chart_data = []
-            for yd in years_data_bs:
-                chart_data.append({
-                    'Anno': f"{yd['year']}\n({yd['type']})",
-                    'Totale Attivo': float(yd['bs'].total_assets),
-                    'Patrimonio Netto': float(yd['bs'].total_equity),
-                    'Debiti Totali': float(yd['bs'].total_debt)
-                })
-
-            df_chart_bs = pd.DataFrame(chart_data)
-            st.bar_chart(df_chart_bs, x='Anno', y=['Totale Attivo', 'Patrimonio Netto', 'Debiti Totali'])
+            df_chart_bs = _chart_table(BS_CHART_SERIES, {yc.chart_label: yc.bs for yc in years_data_bs})
+            st.bar_chart(df_chart_bs, x='Anno', y=[name for name, _ in BS_CHART_SERIES])
 
     with tab3:
         # Financial Ratios view
         st.subheader("Indici Finanziari - Storico vs Budget")
 
-        # Calculate ratios for all years
-        ratios_data = []
-
-        for yd in years_data_bs:
-            bs = yd['bs']
-            # Find corresponding income statement
-            inc = next((y['inc'] for y in years_data if y['year'] == yd['year']), None)
-
-            if inc and bs:
-                # Calculate key ratios
-                roe = (inc.net_profit / bs.total_equity * 100) if bs.total_equity > 0 else Decimal('0')
-                roa = (inc.net_profit / bs.total_assets * 100) if bs.total_assets > 0 else Decimal('0')
-                current_ratio = (bs.current_assets / bs.current_liabilities) if bs.current_liabilities > 0 else Decimal('0')
-                debt_to_equity = (bs.total_debt / bs.total_equity) if bs.total_equity > 0 else Decimal('0')
-                ebitda_margin = (inc.ebitda / inc.revenue * 100) if inc.revenue > 0 else Decimal('0')
-
-                ratios_data.append({
-                    'Anno': f"{yd['year']} ({yd['type']})",
-                    'ROE (%)': float(roe),
-                    'ROA (%)': float(roa),
-                    'Current Ratio': float(current_ratio),
-                    'Debt/Equity': float(debt_to_equity),
-                    'EBITDA Margin (%)': float(ebitda_margin)
+        # Years with both statements
+        matched = [yc for yc in year_cols if yc.inc and yc.bs]
+
+        if matched:
+            # Ratios for all years at once on float arrays; a ratio is 0 where
+            # its denominator is not positive
+            net_profit = _float_array(yc.inc.net_profit for yc in matched)
+            ebitda = _float_array(yc.inc.ebitda for yc in matched)
+            revenue = _float_array(yc.inc.revenue for yc in matched)
+            equity = _float_array(yc.bs.total_equity for yc in matched)
+            assets = _float_array(yc.bs.total_assets for yc in matched)
+            curr_assets = _float_array(yc.bs.current_assets for yc in matched)
+            curr_liab = _float_array(yc.bs.current_liabilities for yc in matched)
+            debt = _float_array(yc.bs.total_debt for yc in matched)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                df_ratios = pd.DataFrame({
+                    'Anno': [yc.label for yc in matched],
+                    'ROE (%)': np.where(equity > 0, net_profit / equity * 100, 0.0),
+                    'ROA (%)': np.where(assets > 0, net_profit / assets * 100, 0.0),
+                    'Current Ratio': np.where(curr_liab > 0, curr_assets / curr_liab, 0.0),
+                    'Debt/Equity': np.where(equity > 0, debt / equity, 0.0),
+                    'EBITDA Margin (%)': np.where(revenue > 0, ebitda / revenue * 100, 0.0),
                 })
 
-        if ratios_data:
-            df_ratios = pd.DataFrame(ratios_data)
-
             # Display as metrics
             col1, col2, col3, col4, col5 = st.columns(5)
 
-            latest = ratios_data[-1]
+            latest = df_ratios.iloc[-1]
 
             with col1:
                 st.metric("ROE", f"{latest['ROE (%)']:.2f}%")
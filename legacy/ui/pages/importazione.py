@@ -89,6 +89,7 @@ def show():
 
                     # Clean up temp file
                     os.unlink(tmp_file_path)
+                    st.cache_data.clear()
 
                     # Show success
                     if result.get('company_created'):
@@ -186,6 +187,7 @@ def show():
 
                     # Clean up temp file
                     os.unlink(tmp_file_path)
+                    st.cache_data.clear()
 
                     # Show success
                     st.success("✅ Importazione completata con successo!")
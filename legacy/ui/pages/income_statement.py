@@ -43,6 +43,7 @@ def show():
             new_inc = IncomeStatement(financial_year_id=fy.id)
             db.add(new_inc)
             db.commit()
+            st.cache_data.clear()
             st.success("✅ Conto Economico creato!")
             st.rerun()
 
@@ -230,6 +231,7 @@ def show():
                     inc.ce20_imposte = Decimal(str(ce20))
 
                     db.commit()
+                    st.cache_data.clear()
                     st.success("✅ Conto Economico aggiornato!")
                     st.rerun()
 
@@ -3,10 +3,90 @@ SP Previsionale - Balance Sheet Forecast View
 Display forecasted balance sheets with historical comparison
 """
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
-from database.models import Company, FinancialYear, BudgetScenario, ForecastYear
-from decimal import Decimal
+import plotly.graph_objects as go
+from operator import attrgetter
+from ui.forecast_data import (
+    load_scenarios, load_forecast_years, load_historical, regenerate_forecast
+)
+from ui.statement_tables import statement_table
+
+
+# Balance sheet table rows, in the ui.statement_tables row format
+SP_TABLE_ROWS = (
+    ("ATTIVO", None),
+    ("B) Immobilizzazioni", None),
+    ("  Immateriali", 'sp02_immob_immateriali'),
+    ("  Materiali", 'sp03_immob_materiali'),
+    ("  Finanziarie", 'sp04_immob_finanziarie'),
+    ("  TOTALE IMMOBILIZZAZIONI", 'fixed_assets'),
+    ("", None),
+    ("C) Attivo Corrente", None),
+    ("  Rimanenze", 'sp05_rimanenze'),
+    ("  Crediti breve", 'sp06_crediti_breve'),
+    ("  Crediti lungo", 'sp07_crediti_lungo'),
+    ("  Liquidità", 'sp09_disponibilita_liquide'),
+    ("  TOTALE ATTIVO CORRENTE", 'current_assets'),
+    ("", None),
+    ("TOTALE ATTIVO", 'total_assets'),
+    ("", None),
+    ("PASSIVO E PATRIMONIO NETTO", None),
+    ("A) Patrimonio Netto", None),
+    ("  Capitale", 'sp11_capitale'),
+    ("  Riserve", 'sp12_riserve'),
+    ("  Utile/Perdita", 'sp13_utile_perdita'),
+    ("  TOTALE PATRIMONIO NETTO", 'total_equity'),
+    ("", None),
+    ("B-D) Debiti e Fondi", None),
+    ("  Debiti breve termine", 'sp16_debiti_breve'),
+    ("  Debiti lungo termine", 'sp17_debiti_lungo'),
+    ("  TFR", 'sp15_tfr'),
+    ("  TOTALE DEBITI", lambda bs: bs.total_debt + bs.sp15_tfr),
+    ("", None),
+    ("TOTALE PASSIVO", 'total_liabilities'),
+)
+
+# Chart series as (series name, field); a callable derives the value
+SP_CHART_SERIES = (
+    ('Immobilizzazioni', 'fixed_assets'),
+    ('Attivo Corrente', 'current_assets'),
+    ('Patrimonio Netto', 'total_equity'),
+    ('Debiti Totali', 'total_debt'),
+    ('Liquidità', 'sp09_disponibilita_liquide'),
+    ('Crediti', lambda bs: bs.sp06_crediti_breve + bs.sp07_crediti_lungo),
+)
+_CHART_GETTERS = tuple(
+    field if callable(field) else attrgetter(field) for _, field in SP_CHART_SERIES
+)
+
+# Balance sheet fields read by this page, snapshotted by the ui.forecast_data loaders
+BS_FIELDS = (
+    'sp02_immob_immateriali', 'sp03_immob_materiali', 'sp04_immob_finanziarie',
+    'sp05_rimanenze', 'sp06_crediti_breve', 'sp07_crediti_lungo',
+    'sp09_disponibilita_liquide', 'sp11_capitale', 'sp12_riserve',
+    'sp13_utile_perdita', 'sp15_tfr', 'sp16_debiti_breve', 'sp17_debiti_lungo',
+    'fixed_assets', 'current_assets', 'total_assets', 'total_equity',
+    'total_debt', 'total_liabilities',
+)
+
+
+def _chart_table(columns):
+    """
+    Build the data shared by the three trend charts, column by column
+
+    Args:
+        columns: Chart label -> balance sheet snapshot
+
+    Returns:
+        DataFrame with an "Anno" column followed by one float column per
+        series in SP_CHART_SERIES
+    """
+    data = {"Anno": list(columns)}
+    for (name, _), getter in zip(SP_CHART_SERIES, _CHART_GETTERS):
+        data[name] = np.fromiter(map(getter, columns.values()), dtype=np.float64,
+                                 count=len(columns))
+    return pd.DataFrame(data)
 
 
 def show():
@@ -21,15 +101,10 @@ def show():
         st.warning("⚠️ Seleziona un'azienda in alto")
         return
 
-    company = db.query(Company).filter(
-        Company.id == st.session_state.selected_company_id
-    ).first()
+    company_id = st.session_state.selected_company_id
 
     # Get all active scenarios for this company
-    scenarios = db.query(BudgetScenario).filter(
-        BudgetScenario.company_id == company.id,
-        BudgetScenario.is_active == 1
-    ).order_by(BudgetScenario.created_at.desc()).all()
+    scenarios = load_scenarios(db, company_id)
 
     if not scenarios:
         st.info("📝 Nessuno scenario attivo trovato. Crea uno scenario nella sezione 'Input Ipotesi'")
@@ -43,20 +118,17 @@ def show():
     )
 
     scenario_id = scenario_options[selected_scenario_name]
-    scenario = db.query(BudgetScenario).filter(BudgetScenario.id == scenario_id).first()
+    scenario = next(s for s in scenarios if s.id == scenario_id)
 
     # Get forecast years
-    forecast_years = db.query(ForecastYear).filter(
-        ForecastYear.scenario_id == scenario_id
-    ).order_by(ForecastYear.year).all()
+    forecast_years = load_forecast_years(db, scenario_id, bs_fields=BS_FIELDS)
 
     if not forecast_years:
         st.warning("⚠️ Nessun dato previsionale trovato. Calcola lo scenario nella sezione 'Input Ipotesi'.")
 
         # Add recalculate button
         if st.button("🔄 Ricalcola Scenario"):
-            from calculations.forecast_engine import generate_forecast_for_scenario
-            result = generate_forecast_for_scenario(scenario_id, db)
+            result = regenerate_forecast(scenario_id, db)
             if result:
                 st.success("✅ Scenario ricalcolato con successo!")
                 st.rerun()
@@ -65,11 +137,7 @@ def show():
         return
 
     # Get actual historical data
-    historical_years = db.query(FinancialYear).filter(
-        FinancialYear.company_id == company.id,
-        FinancialYear.year <= scenario.base_year
-    ).order_by(FinancialYear.year.desc()).limit(3).all()
-    historical_years.reverse()  # Chronological order
+    historical_years = load_historical(db, company_id, scenario.base_year, bs_fields=BS_FIELDS)
 
     st.markdown("---")
 
@@ -78,70 +146,31 @@ def show():
 
     # Historical data
     for hy in historical_years:
-        if hy.balance_sheet:
+        if hy.bs:
             years_data_bs.append({
                 'year': hy.year,
                 'type': 'Storico',
-                'bs': hy.balance_sheet
+                'bs': hy.bs
             })
 
     # Forecast data
     for fy in forecast_years:
-        if fy.balance_sheet:
+        if fy.bs:
             years_data_bs.append({
                 'year': fy.year,
                 'type': 'Budget',
-                'bs': fy.balance_sheet
+                'bs': fy.bs
             })
 
     # Build balance sheet table
     if years_data_bs:
         st.subheader("📊 Stato Patrimoniale - Dati Storici e Previsionali")
 
-        rows = [
-            {"Voce": "ATTIVO", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "B) Immobilizzazioni", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "  Immateriali", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp02_immob_immateriali for yd in years_data_bs}},
-            {"Voce": "  Materiali", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp03_immob_materiali for yd in years_data_bs}},
-            {"Voce": "  Finanziarie", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp04_immob_finanziarie for yd in years_data_bs}},
-            {"Voce": "  TOTALE IMMOBILIZZAZIONI", **{f"{yd['year']} ({yd['type']})": yd['bs'].fixed_assets for yd in years_data_bs}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "C) Attivo Corrente", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "  Rimanenze", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp05_rimanenze for yd in years_data_bs}},
-            {"Voce": "  Crediti breve", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp06_crediti_breve for yd in years_data_bs}},
-            {"Voce": "  Crediti lungo", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp07_crediti_lungo for yd in years_data_bs}},
-            {"Voce": "  Liquidità", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp09_disponibilita_liquide for yd in years_data_bs}},
-            {"Voce": "  TOTALE ATTIVO CORRENTE", **{f"{yd['year']} ({yd['type']})": yd['bs'].current_assets for yd in years_data_bs}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "TOTALE ATTIVO", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_assets for yd in years_data_bs}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "PASSIVO E PATRIMONIO NETTO", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "A) Patrimonio Netto", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "  Capitale", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp11_capitale for yd in years_data_bs}},
-            {"Voce": "  Riserve", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp12_riserve for yd in years_data_bs}},
-            {"Voce": "  Utile/Perdita", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp13_utile_perdita for yd in years_data_bs}},
-            {"Voce": "  TOTALE PATRIMONIO NETTO", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_equity for yd in years_data_bs}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "B-D) Debiti e Fondi", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "  Debiti breve termine", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp16_debiti_breve for yd in years_data_bs}},
-            {"Voce": "  Debiti lungo termine", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp17_debiti_lungo for yd in years_data_bs}},
-            {"Voce": "  TFR", **{f"{yd['year']} ({yd['type']})": yd['bs'].sp15_tfr for yd in years_data_bs}},
-            {"Voce": "  TOTALE DEBITI", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_debt + yd['bs'].sp15_tfr for yd in years_data_bs}},
-            {"Voce": "", **{f"{yd['year']} ({yd['type']})": "" for yd in years_data_bs}},
-            {"Voce": "TOTALE PASSIVO", **{f"{yd['year']} ({yd['type']})": yd['bs'].total_liabilities for yd in years_data_bs}},
-        ]
-
-        df_bs = pd.DataFrame(rows)
-
-        # Format numeric columns
-        for col in df_bs.columns:
-            if col != "Voce":
-                df_bs[col] = df_bs[col].apply(
-                    lambda x: f"€{x:,.0f}" if isinstance(x, Decimal) and x != "" else x
-                )
+        columns = {f"{yd['year']} ({yd['type']})": yd['bs'] for yd in years_data_bs}
+        styled_bs = statement_table(SP_TABLE_ROWS, columns)
 
         st.dataframe(
-            df_bs,
+            styled_bs,
             hide_index=True,
             use_container_width=True,
             height=700
@@ -152,31 +181,24 @@ def show():
         # Charts
         st.subheader("📈 Trend Patrimoniale")
 
-        chart_data = []
-        for yd in years_data_bs:
-            chart_data.append({
-                'Anno': f"{yd['year']} ({yd['type']})",
-                'Totale Attivo': float(yd['bs'].total_assets),
-                'Immobilizzazioni': float(yd['bs'].fixed_assets),
-                'Attivo Corrente': float(yd['bs'].current_assets)
-            })
+        # One frame for all three charts; the labels match the table columns
+        df_chart = _chart_table(columns)
 
-        df_chart_bs = pd.DataFrame(chart_data)
+        # graph_objects traces straight from the frame's columns, no px melt
+        years = df_chart['Anno']
 
-        fig_assets = px.bar(
-            df_chart_bs,
-            x='Anno',
-            y=['Immobilizzazioni', 'Attivo Corrente'],
-            title="Composizione Attivo",
-            labels={'value': 'Valore (€)', 'variable': 'Componente'},
-            barmode='stack'
-        )
+        fig_assets = go.Figure()
+        for name in ('Immobilizzazioni', 'Attivo Corrente'):
+            fig_assets.add_trace(go.Bar(x=years, y=df_chart[name], name=name))
 
         fig_assets.update_layout(
+            title="Composizione Attivo",
+            barmode='stack',
             xaxis_title="Anno",
             yaxis_title="Valore (€)",
             legend_title="Attivo",
-            hovermode='x unified'
+            hovermode='x unified',
+            transition_duration=0
         )
 
         st.plotly_chart(fig_assets, use_container_width=True)
@@ -184,30 +206,18 @@ def show():
         # Equity vs Debt chart
         st.subheader("📊 Struttura Patrimoniale")
 
-        equity_debt_data = []
-        for yd in years_data_bs:
-            equity_debt_data.append({
-                'Anno': f"{yd['year']} ({yd['type']})",
-                'Patrimonio Netto': float(yd['bs'].total_equity),
-                'Debiti Totali': float(yd['bs'].total_debt)
-            })
-
-        df_equity_debt = pd.DataFrame(equity_debt_data)
-
-        fig_equity = px.bar(
-            df_equity_debt,
-            x='Anno',
-            y=['Patrimonio Netto', 'Debiti Totali'],
-            title="Patrimonio Netto vs Debiti",
-            labels={'value': 'Valore (€)', 'variable': 'Componente'},
-            barmode='group'
-        )
+        fig_equity = go.Figure()
+        for name in ('Patrimonio Netto', 'Debiti Totali'):
+            fig_equity.add_trace(go.Bar(x=years, y=df_chart[name], name=name))
 
         fig_equity.update_layout(
+            title="Patrimonio Netto vs Debiti",
+            barmode='group',
             xaxis_title="Anno",
             yaxis_title="Valore (€)",
             legend_title="Componenti",
-            hovermode='x unified'
+            hovermode='x unified',
+            transition_duration=0
         )
 
         st.plotly_chart(fig_equity, use_container_width=True)
@@ -215,30 +225,19 @@ def show():
         # Liquidity chart
         st.subheader("💰 Liquidità")
 
-        liquidity_data = []
-        for yd in years_data_bs:
-            liquidity_data.append({
-                'Anno': f"{yd['year']} ({yd['type']})",
-                'Liquidità': float(yd['bs'].sp09_disponibilita_liquide),
-                'Crediti': float(yd['bs'].sp06_crediti_breve + yd['bs'].sp07_crediti_lungo)
-            })
-
-        df_liquidity = pd.DataFrame(liquidity_data)
-
-        fig_liq = px.line(
-            df_liquidity,
-            x='Anno',
-            y=['Liquidità', 'Crediti'],
-            title="Andamento Liquidità e Crediti",
-            labels={'value': 'Valore (€)', 'variable': 'Componente'},
-            markers=True
-        )
+        # WebGL line traces, rendered on the GPU by the browser
+        fig_liq = go.Figure()
+        for name in ('Liquidità', 'Crediti'):
+            fig_liq.add_trace(go.Scattergl(x=years, y=df_chart[name], name=name,
+                                           mode='lines+markers'))
 
         fig_liq.update_layout(
+            title="Andamento Liquidità e Crediti",
             xaxis_title="Anno",
             yaxis_title="Valore (€)",
             legend_title="Componenti",
-            hovermode='x unified'
+            hovermode='x unified',
+            transition_duration=0
         )
 
         st.plotly_chart(fig_liq, use_container_width=True)
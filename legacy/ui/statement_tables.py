@@ -0,0 +1,58 @@
+"""
+Statement Tables - year-by-year statement tables shared by the forecast pages
+
+A table is described by (label, field) rows: a field of None is a heading
+or spacer row, a callable derives the value from the statement, anything
+else names a statement attribute.
+"""
+import pandas as pd
+
+
+# Income statement rows shown by the forecast view and CE previsionale pages
+INC_TABLE_ROWS = (
+    ("A) Valore della produzione", None),
+    ("  Ricavi vendite", 'ce01_ricavi_vendite'),
+    ("  Altri ricavi", 'ce04_altri_ricavi'),
+    ("  TOTALE VALORE PRODUZIONE", 'production_value'),
+    ("", None),
+    ("B) Costi della produzione", None),
+    ("  Materie prime", 'ce05_materie_prime'),
+    ("  Servizi", 'ce06_servizi'),
+    ("  Godimento beni terzi", 'ce07_godimento_beni'),
+    ("  Costi personale", 'ce08_costi_personale'),
+    ("  Ammortamenti", 'ce09_ammortamenti'),
+    ("  Oneri diversi", 'ce12_oneri_diversi'),
+    ("  TOTALE COSTI PRODUZIONE", 'production_cost'),
+    ("", None),
+    ("EBITDA", 'ebitda'),
+    ("EBIT", 'ebit'),
+    ("Risultato Netto", 'net_profit'),
+)
+
+# Amount format for the statement tables
+EURO_FORMAT = "€{:,.0f}"
+
+
+def statement_table(table_rows, columns):
+    """
+    Build a statement table column by column, styled for display
+
+    Amounts stay numeric (float, NaN on heading rows) and are formatted by
+    the Styler in one pass over the amount columns.
+
+    Args:
+        table_rows: (label, field) pairs, see INC_TABLE_ROWS
+        columns: Column header -> statement snapshot
+
+    Returns:
+        Styler over a "Voce" column followed by one column per statement
+    """
+    data = {"Voce": [label for label, _ in table_rows]}
+    for header, statement in columns.items():
+        data[header] = [
+            None if field is None
+            else float(field(statement)) if callable(field)
+            else float(getattr(statement, field))
+            for _, field in table_rows
+        ]
+    return pd.DataFrame(data).style.format(EURO_FORMAT, subset=list(columns), na_rep="")
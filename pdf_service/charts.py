@@ -4,12 +4,18 @@ Each function returns a BytesIO PNG image.
 """
 import io
 import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from typing import List, Dict, Tuple, Optional
+from functools import lru_cache, wraps
+from typing import Callable, List, Dict, Tuple, Optional
 import matplotlib
 matplotlib.use('Agg')  # Non-interactive backend
-import matplotlib.pyplot as plt
 import matplotlib.patches as patches
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 import numpy as np
 
 from pdf_service.styles import (
@@ -18,8 +24,14 @@ from pdf_service.styles import (
     CHART_LIGHT_BLUE, CHART_LIGHT_GREEN,
 )
 
-# Global matplotlib settings
-plt.rcParams.update({
+# Optional: MinMax-LTTB downsampling for very long line-chart series
+try:
+    from tsdownsample import MinMaxLTTBDownsampler
+except ImportError:
+    MinMaxLTTBDownsampler = None
+
+# Chart style, applied only while charts are being drawn (see _styled)
+_RC = {
     'font.family': 'sans-serif',
     'font.sans-serif': ['DejaVu Sans', 'Helvetica', 'Arial'],
     'font.size': 9,
@@ -33,32 +45,109 @@ plt.rcParams.update({
     'axes.grid': True,
     'grid.alpha': 0.3,
     'grid.linestyle': '--',
-})
+}
 
 DPI = 150
 
+# Line-chart series longer than this are downsampled to DOWNSAMPLE_POINTS
+DOWNSAMPLE_THRESHOLD = 1000
+DOWNSAMPLE_POINTS = 500
+
+# Figures are kept alive and cleared between charts instead of being
+# rebuilt each call; one pool per thread, keyed by (figsize, polar)
+_fig_pool = threading.local()
+
+_SUBPLOT_DEFAULTS = {
+    key: matplotlib.rcParams[f'figure.subplot.{key}']
+    for key in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+}
+
+
+# rcParams are process-global, so overlapping charts share one activation
+# of _RC: the first to start applies it, the last to finish restores
+_style_lock = threading.Lock()
+_style_users = 0
+_style_saved: Dict[str, object] = {}
+
+
+def _styled(chart_fn):
+    """Run a chart function with the _RC style active."""
+    @wraps(chart_fn)
+    def wrapper(*args, **kwargs):
+        global _style_users
+        with _style_lock:
+            if _style_users == 0:
+                _style_saved.update({key: matplotlib.rcParams[key] for key in _RC})
+                matplotlib.rcParams.update(_RC)
+            _style_users += 1
+        try:
+            return chart_fn(*args, **kwargs)
+        finally:
+            with _style_lock:
+                _style_users -= 1
+                if _style_users == 0:
+                    matplotlib.rcParams.update(_style_saved)
+                    _style_saved.clear()
+    return wrapper
+
+
+def _get_fig(size: Tuple[float, float], polar: bool = False):
+    """Return a cleared pooled figure of the given size and a fresh axes."""
+    pool = getattr(_fig_pool, 'figures', None)
+    if pool is None:
+        pool = _fig_pool.figures = {}
+    key = (tuple(size), polar)
+    fig = pool.get(key)
+    if fig is None:
+        # Figure + Agg canvas directly, so no pyplot global state is touched
+        fig = pool[key] = Figure(figsize=size)
+        FigureCanvasAgg(fig)
+    else:
+        fig.clf()
+        fig.subplots_adjust(**_SUBPLOT_DEFAULTS)
+    ax = fig.add_subplot(projection='polar' if polar else None)
+    return fig, ax
+
 
 def _fig_to_bytes(fig, dpi=DPI) -> io.BytesIO:
     """Convert matplotlib figure to PNG BytesIO."""
     buf = io.BytesIO()
+    # ReportLab decodes the PNG and re-compresses it into the PDF, so
+    # spending CPU on PNG compression here buys nothing
     fig.savefig(buf, format='png', dpi=dpi, bbox_inches='tight',
-                facecolor='white', edgecolor='none')
-    plt.close(fig)
+                facecolor='white', edgecolor='none',
+                pil_kwargs={'compress_level': 1, 'optimize': False})
     buf.seek(0)
     return buf
 
 
+# Swaps the English separators for Italian ones in a single pass
+_IT_SEPARATORS = str.maketrans({",": ".", ".": ","})
+
+
+def _float_array(values) -> np.ndarray:
+    """Decimal, int or float values as a float64 array."""
+    return np.fromiter(values, dtype=np.float64, count=len(values))
+
+
 def _fmt_number(value, decimals=2) -> str:
     """Format number with Italian locale (dot as thousands separator)."""
     if isinstance(value, Decimal):
         value = float(value)
+    return _fmt_number_cached(value, decimals)
+
+
+@lru_cache(maxsize=4096)
+def _fmt_number_cached(value, decimals) -> str:
+    """Cached body of _fmt_number; the same values recur across charts."""
     if abs(value) >= 1_000_000:
         return f"{value / 1_000_000:,.{decimals}f}M".replace(",", ".")
     elif abs(value) >= 1_000:
         return f"{value / 1_000:,.{decimals}f}K".replace(",", ".")
-    return f"{value:,.{decimals}f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{value:,.{decimals}f}".translate(_IT_SEPARATORS)
 
 
+@_styled
 def gauge_chart(value: float, min_val: float, max_val: float,
                 label: str, thresholds: List[Tuple[float, str, str]],
                 subtitle: str = "", size: Tuple[float, float] = (3.5, 2.5)
@@ -75,7 +164,7 @@ def gauge_chart(value: float, min_val: float, max_val: float,
         subtitle: Additional text below the value
         size: Figure size in inches
     """
-    fig, ax = plt.subplots(figsize=size, subplot_kw={'projection': 'polar'})
+    fig, ax = _get_fig(size, polar=True)
 
     # Gauge spans from 180 to 0 degrees (left to right semicircle)
     theta_min = math.pi  # 180 degrees
@@ -134,6 +223,7 @@ def gauge_chart(value: float, min_val: float, max_val: float,
     return _fig_to_bytes(fig)
 
 
+@_styled
 def stacked_bar_chart(years: List[int], data_series: List[Dict],
                       title: str, ylabel: str = "%",
                       size: Tuple[float, float] = (7, 4),
@@ -149,24 +239,23 @@ def stacked_bar_chart(years: List[int], data_series: List[Dict],
         size: Figure size
         show_values: Show value labels on bars
     """
-    fig, ax = plt.subplots(figsize=size)
+    fig, ax = _get_fig(size)
 
     x = np.arange(len(years))
     bar_width = 0.6
     bottom = np.zeros(len(years))
 
     for series in data_series:
-        values = [float(v) for v in series['values']]
+        values = _float_array(series['values'])
         bars = ax.bar(x, values, bar_width, bottom=bottom,
                       label=series['label'], color=series['color'], alpha=0.85)
         if show_values:
-            for i, (bar, val) in enumerate(zip(bars, values)):
-                if abs(val) > 3:  # Only show label if segment is visible
-                    ax.text(bar.get_x() + bar.get_width() / 2,
-                            bottom[i] + val / 2,
-                            f"{val:.1f}%", ha='center', va='center',
-                            fontsize=7, color='white', fontweight='bold')
-        bottom += np.array(values)
+            # Only label segments big enough to be visible
+            ax.bar_label(bars, labels=[f"{val:.1f}%" if abs(val) > 3 else ""
+                                       for val in values],
+                         label_type='center', fontsize=7, color='white',
+                         fontweight='bold')
+        bottom += values
 
     ax.set_xticks(x)
     ax.set_xticklabels([str(y) for y in years])
@@ -181,6 +270,7 @@ def stacked_bar_chart(years: List[int], data_series: List[Dict],
     return _fig_to_bytes(fig)
 
 
+@_styled
 def line_chart(years: List[int], data_series: List[Dict],
                title: str, ylabel: str = "",
                size: Tuple[float, float] = (7, 3.5),
@@ -201,14 +291,29 @@ def line_chart(years: List[int], data_series: List[Dict],
         format_pct: Format values as percentages
         format_currency: Format values as currency
         y_zero_line: Draw horizontal line at y=0
+
+    Series longer than DOWNSAMPLE_THRESHOLD points are reduced with
+    MinMax-LTTB when tsdownsample is installed; downsampled charts are
+    drawn without markers, value annotations or per-year ticks.
     """
-    fig, ax = plt.subplots(figsize=size)
+    fig, ax = _get_fig(size)
+    downsample = (MinMaxLTTBDownsampler is not None
+                  and len(years) > DOWNSAMPLE_THRESHOLD)
+    if downsample:
+        x_all = np.asarray(years, dtype=float)
+        show_values = False
 
     for series in data_series:
-        values = [float(v) for v in series['values']]
+        values = _float_array(series['values'])
+        x_plot = years
         line_style = series.get('linestyle', '-')
         marker = series.get('marker', 'o')
-        ax.plot(years, values, marker=marker, label=series['label'],
+        if downsample:
+            idx = MinMaxLTTBDownsampler().downsample(
+                x_all, values, n_out=DOWNSAMPLE_POINTS)
+            x_plot, values = x_all[idx], values[idx]
+            marker = None
+        ax.plot(x_plot, values, marker=marker, label=series['label'],
                 color=series['color'], linewidth=2, markersize=5,
                 linestyle=line_style)
 
@@ -227,8 +332,9 @@ def line_chart(years: List[int], data_series: List[Dict],
     if y_zero_line:
         ax.axhline(y=0, color='gray', linewidth=0.5, linestyle='-')
 
-    ax.set_xticks(years)
-    ax.set_xticklabels([str(y) for y in years])
+    if not downsample:
+        ax.set_xticks(years)
+        ax.set_xticklabels([str(y) for y in years])
     ax.set_ylabel(ylabel)
     ax.set_title(title, fontsize=11, fontweight='bold', color='#1a365d')
     if len(data_series) > 1:
@@ -240,6 +346,7 @@ def line_chart(years: List[int], data_series: List[Dict],
     return _fig_to_bytes(fig)
 
 
+@_styled
 def waterfall_chart(labels: List[str], values: List[float],
                     title: str, size: Tuple[float, float] = (7, 4)
                     ) -> io.BytesIO:
@@ -252,47 +359,43 @@ def waterfall_chart(labels: List[str], values: List[float],
         title: Chart title
         size: Figure size
     """
-    fig, ax = plt.subplots(figsize=size)
+    fig, ax = _get_fig(size)
 
     n = len(labels)
-    running = 0
-    bottoms = []
-    bar_colors = []
-
-    for i, val in enumerate(values):
-        if i == 0 or i == n - 1:
-            # First and last bars start from 0
-            bottoms.append(0)
-            bar_colors.append(CHART_BLUE)
-        else:
-            if val >= 0:
-                bottoms.append(running)
-                bar_colors.append(CHART_GREEN)
-            else:
-                bottoms.append(running + val)
-                bar_colors.append(CHART_RED)
-        running += val if i < n - 1 else 0
+    vals = _float_array(values)
+    heights = np.abs(vals)
+
+    # Running total before each bar; decreases hang down from it
+    running = np.concatenate(([0.0], np.cumsum(vals[:-1])))
+    bottoms = np.where(vals >= 0, running, running + vals)
+    bar_colors = np.where(vals >= 0, CHART_GREEN, CHART_RED)
+    if n:
+        # First and last bars start from 0
+        bottoms[[0, -1]] = 0
+        bar_colors[[0, -1]] = CHART_BLUE
 
     x = np.arange(n)
     display_values = [abs(v) if i > 0 and i < n - 1 else v
                       for i, v in enumerate(values)]
 
-    bars = ax.bar(x, [abs(v) for v in values], bottom=bottoms,
-                  color=bar_colors, alpha=0.85, width=0.6)
-
-    # Connector lines
-    for i in range(n - 1):
-        top = bottoms[i] + abs(values[i])
-        ax.plot([i + 0.3, i + 0.7], [top, top],
-                color='gray', linewidth=0.5, linestyle='--')
-
-    # Value labels
-    for i, (bar, val) in enumerate(zip(bars, values)):
-        y_pos = bottoms[i] + abs(val) / 2
-        txt = _fmt_number(val, 0)
-        ax.text(bar.get_x() + bar.get_width() / 2, y_pos, txt,
-                ha='center', va='center', fontsize=7, fontweight='bold',
-                color='white' if abs(val) > 0 else CHART_GRAY)
+    bars = ax.bar(x, heights, bottom=bottoms,
+                  color=bar_colors.tolist(), alpha=0.85, width=0.6)
+
+    # Connector lines, drawn as one collection
+    tops = (bottoms + heights)[:-1]
+    segments = np.stack([
+        np.column_stack((x[:-1] + 0.3, tops)),
+        np.column_stack((x[:-1] + 0.7, tops)),
+    ], axis=1)
+    ax.add_collection(LineCollection(segments, colors='gray',
+                                     linewidths=0.5, linestyles='--'))
+
+    # Value labels; zero-height bars get a grey label, white would vanish
+    texts = ax.bar_label(bars, labels=[_fmt_number(val, 0) for val in values],
+                         label_type='center', fontsize=7, fontweight='bold',
+                         color='white')
+    for text in np.asarray(texts, dtype=object)[heights == 0]:
+        text.set_color(CHART_GRAY)
 
     ax.set_xticks(x)
     ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=7)
@@ -304,6 +407,7 @@ def waterfall_chart(labels: List[str], values: List[float],
     return _fig_to_bytes(fig)
 
 
+@_styled
 def bar_chart(labels: List[str], values: List[float],
               title: str, colors: Optional[List[str]] = None,
               ylabel: str = "", horizontal: bool = False,
@@ -320,7 +424,7 @@ def bar_chart(labels: List[str], values: List[float],
         horizontal: If True, create horizontal bars
         size: Figure size
     """
-    fig, ax = plt.subplots(figsize=size)
+    fig, ax = _get_fig(size)
 
     if colors is None:
         colors = [CHART_BLUE] * len(values)
@@ -332,19 +436,13 @@ def bar_chart(labels: List[str], values: List[float],
         ax.set_yticks(x)
         ax.set_yticklabels(labels, fontsize=8)
         ax.set_xlabel(ylabel)
-        for bar, val in zip(bars, values):
-            ax.text(bar.get_width() + 0.01 * max(abs(v) for v in values),
-                    bar.get_y() + bar.get_height() / 2,
-                    f"{val:.4f}", va='center', fontsize=7)
+        ax.bar_label(bars, fmt="{:.4f}", padding=3, fontsize=7)
     else:
         bars = ax.bar(x, values, color=colors, alpha=0.85, width=0.6)
         ax.set_xticks(x)
         ax.set_xticklabels(labels, rotation=45, ha='right', fontsize=8)
         ax.set_ylabel(ylabel)
-        for bar, val in zip(bars, values):
-            ax.text(bar.get_x() + bar.get_width() / 2,
-                    bar.get_height(), f"{val:.4f}",
-                    ha='center', va='bottom', fontsize=7)
+        ax.bar_label(bars, fmt="{:.4f}", fontsize=7)
 
     ax.set_title(title, fontsize=11, fontweight='bold', color='#1a365d')
     ax.spines['top'].set_visible(False)
@@ -354,6 +452,7 @@ def bar_chart(labels: List[str], values: List[float],
     return _fig_to_bytes(fig)
 
 
+@_styled
 def dual_axis_chart(years: List[int],
                     series1: Dict, series2: Dict,
                     title: str,
@@ -371,11 +470,11 @@ def dual_axis_chart(years: List[int],
         ylabel2: Right Y-axis label
         size: Figure size
     """
-    fig, ax1 = plt.subplots(figsize=size)
+    fig, ax1 = _get_fig(size)
     ax2 = ax1.twinx()
 
-    vals1 = [float(v) for v in series1['values']]
-    vals2 = [float(v) for v in series2['values']]
+    vals1 = _float_array(series1['values'])
+    vals2 = _float_array(series2['values'])
 
     ax1.bar(years, vals1, color=series1['color'], alpha=0.6, width=0.6,
             label=series1['label'])
@@ -397,3 +496,24 @@ def dual_axis_chart(years: List[int],
 
     fig.tight_layout()
     return _fig_to_bytes(fig)
+
+
+def render_all(chart_specs: Dict[str, Callable[[], io.BytesIO]]
+               ) -> Dict[str, io.BytesIO]:
+    """
+    Render several charts concurrently.
+
+    Args:
+        chart_specs: Mapping of chart name to a zero-argument callable,
+            typically a functools.partial over one of the chart functions
+
+    Returns:
+        Mapping of chart name to PNG BytesIO, in the order of chart_specs
+    """
+    if not chart_specs:
+        return {}
+    workers = min(len(chart_specs), os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {name: executor.submit(render)
+                   for name, render in chart_specs.items()}
+        return {name: future.result() for name, future in futures.items()}
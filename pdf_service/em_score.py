@@ -5,6 +5,7 @@ For manufacturing sectors (sector 1), recalculates Z-Score using the
 services formula before lookup, since the EM-Score table is calibrated
 on the 4-component model.
 """
+from bisect import bisect_right
 from decimal import Decimal
 from typing import Tuple
 
@@ -33,6 +34,37 @@ EM_SCORE_TABLE = [
     (Decimal("-999"), "D"),
 ]
 
+# The same table ascending, split into parallel lists for bisect lookup.
+# Thresholds stay Decimal: converting the Z-Score to float would rate
+# high-precision values just below a threshold one notch up, and would
+# let NaN through as "AAA" instead of raising.
+_THRESHOLDS_ASC = [threshold for threshold, _ in reversed(EM_SCORE_TABLE)]
+_RATINGS_ASC = [rating for _, rating in reversed(EM_SCORE_TABLE)]
+
+# Italian description for each EM-Score rating
+EM_SCORE_DESCRIPTIONS = {
+    "AAA": "Sicurezza massima",
+    "AA+": "Sicurezza elevata",
+    "AA": "Sicurezza elevata",
+    "AA-": "Ampia solvibilita",
+    "A+": "Solvibilita",
+    "A": "Solvibilita",
+    "A-": "Solvibilita sufficiente",
+    "BBB+": "Vulnerabilita",
+    "BBB": "Vulnerabilita",
+    "BBB-": "Vulnerabilita elevata",
+    "BB+": "Rischio",
+    "BB": "Rischio",
+    "BB-": "Rischio elevato",
+    "B+": "Rischio molto elevato",
+    "B": "Rischio molto elevato",
+    "B-": "Rischio altissimo",
+    "CCC+": "Rischio di insolvenza",
+    "CCC": "Insolvenza imminente",
+    "CCC-": "Insolvenza imminente",
+    "D": "Insolvenza",
+}
+
 
 def calculate_em_score(z_score: Decimal, sector: int) -> Tuple[str, Decimal]:
     """
@@ -55,35 +87,13 @@ def calculate_em_score(z_score: Decimal, sector: int) -> Tuple[str, Decimal]:
     # if sector=1, we expect them to pass the services-recalculated value.
     # The EM-Score table is calibrated on the services model.
 
-    for threshold, rating in EM_SCORE_TABLE:
-        if z_used >= threshold:
-            return rating, z_used
-
-    return "D", z_used
+    # Highest threshold <= z_used, i.e. the first row the descending table matches
+    i = bisect_right(_THRESHOLDS_ASC, z_used) - 1
+    if i < 0:
+        return "D", z_used
+    return _RATINGS_ASC[i], z_used
 
 
 def get_em_score_description(rating: str) -> str:
     """Get Italian description for an EM-Score rating."""
-    descriptions = {
-        "AAA": "Sicurezza massima",
-        "AA+": "Sicurezza elevata",
-        "AA": "Sicurezza elevata",
-        "AA-": "Ampia solvibilita",
-        "A+": "Solvibilita",
-        "A": "Solvibilita",
-        "A-": "Solvibilita sufficiente",
-        "BBB+": "Vulnerabilita",
-        "BBB": "Vulnerabilita",
-        "BBB-": "Vulnerabilita elevata",
-        "BB+": "Rischio",
-        "BB": "Rischio",
-        "BB-": "Rischio elevato",
-        "B+": "Rischio molto elevato",
-        "B": "Rischio molto elevato",
-        "B-": "Rischio altissimo",
-        "CCC+": "Rischio di insolvenza",
-        "CCC": "Insolvenza imminente",
-        "CCC-": "Insolvenza imminente",
-        "D": "Insolvenza",
-    }
-    return descriptions.get(rating, "Non classificato")
+    return EM_SCORE_DESCRIPTIONS.get(rating, "Non classificato")
@@ -3,7 +3,8 @@ Report Generator: orchestrator that loads data from the database,
 runs calculators, generates charts, and passes everything to the PDF renderer.
 """
 from decimal import Decimal
-from typing import Dict, List, Any, Optional, Tuple
+from functools import partial
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from sqlalchemy.orm import Session, joinedload
 from io import BytesIO
 
@@ -173,6 +174,8 @@ def _generate_charts(data: ReportData):
     """Generate all chart images for the report."""
     years = [yd.year for yd in data.years]
     latest = data.years[-1]
+    # Charts are independent, so collect them and render concurrently
+    specs: Dict[str, Callable] = {}
 
     # --- Dashboard gauges ---
     # Altman gauge
@@ -183,13 +186,13 @@ def _generate_charts(data: ReportData):
     else:
         thresholds = [(1.1, CHART_RED, "Rischio"), (2.6, CHART_YELLOW, "Ombra"),
                       (10, CHART_GREEN, "Sicuro")]
-    data.chart_images['gauge_altman'] = charts.gauge_chart(
+    specs['gauge_altman'] = partial(charts.gauge_chart,
         z_score, 0, 10, "Altman Z-Score", thresholds,
         subtitle=latest.altman.classification.replace("_", " ").title())
 
     # FGPMI gauge
     fgpmi_pct = (latest.fgpmi.total_score / latest.fgpmi.max_score) * 100
-    data.chart_images['gauge_fgpmi'] = charts.gauge_chart(
+    specs['gauge_fgpmi'] = partial(charts.gauge_chart,
         fgpmi_pct, 0, 100, "Rating FGPMI",
         [(40, CHART_RED, "Rischio"), (65, CHART_YELLOW, "Medio"),
          (100, CHART_GREEN, "Buono")],
@@ -197,23 +200,23 @@ def _generate_charts(data: ReportData):
 
     # EM-Score gauge
     em_z = float(data.em_score_z)
-    data.chart_images['gauge_em'] = charts.gauge_chart(
+    specs['gauge_em'] = partial(charts.gauge_chart,
         em_z, 0, 10, "EM-Score",
         [(3.2, CHART_RED, ""), (5.65, CHART_YELLOW, ""),
          (10, CHART_GREEN, "")],
         subtitle=data.em_score_rating)
 
     # --- Asset/Liability composition ---
-    _generate_composition_charts(data, years)
+    _generate_composition_charts(data, years, specs)
 
     # --- Income margin charts ---
-    _generate_income_charts(data, years)
+    _generate_income_charts(data, years, specs)
 
     # --- Structural analysis ---
-    _generate_structural_charts(data, years)
+    _generate_structural_charts(data, years, specs)
 
     # --- Ratio line charts ---
-    _generate_ratio_charts(data, years)
+    _generate_ratio_charts(data, years, specs)
 
     # --- Altman components ---
     latest_components = latest.altman.components
@@ -224,7 +227,7 @@ def _generate_charts(data: ReportData):
         comp_labels.append("E (FAT/TA)")
         comp_values.append(float(latest_components.E))
     comp_colors = [CHART_BLUE, CHART_GREEN, CHART_ORANGE, CHART_PURPLE, CHART_TEAL]
-    data.chart_images['altman_components'] = charts.bar_chart(
+    specs['altman_components'] = partial(charts.bar_chart,
         comp_labels, comp_values, "Componenti Z-Score",
         colors=comp_colors[:len(comp_values)], horizontal=True,
         size=(6, 3))
@@ -232,7 +235,7 @@ def _generate_charts(data: ReportData):
     # Altman trend
     if len(years) > 1:
         z_values = [float(yd.altman.z_score) for yd in data.years]
-        data.chart_images['altman_trend'] = charts.line_chart(
+        specs['altman_trend'] = partial(charts.line_chart,
             years,
             [{'label': 'Z-Score', 'values': z_values, 'color': CHART_BLUE}],
             "Andamento Z-Score", ylabel="Z-Score",
@@ -242,20 +245,23 @@ def _generate_charts(data: ReportData):
     ind_labels = [f"V{i}" for i in range(1, 8)]
     ind_points = [latest.fgpmi.indicators[f'V{i}'].points for i in range(1, 8)]
     ind_max = [latest.fgpmi.indicators[f'V{i}'].max_points for i in range(1, 8)]
-    data.chart_images['fgpmi_indicators'] = charts.bar_chart(
+    specs['fgpmi_indicators'] = partial(charts.bar_chart,
         ind_labels, ind_points, "Indicatori FGPMI - Punteggi",
         colors=[CHART_BLUE if p >= m * 0.5 else CHART_RED
                 for p, m in zip(ind_points, ind_max)],
         ylabel="Punti", size=(6, 3))
 
     # --- Break Even ---
-    _generate_break_even_chart(data, years)
+    _generate_break_even_chart(data, years, specs)
 
     # --- Cashflow ---
-    _generate_cashflow_charts(data, years)
+    _generate_cashflow_charts(data, years, specs)
 
+    data.chart_images.update(charts.render_all(specs))
 
-def _generate_composition_charts(data: ReportData, years: List[int]):
+
+def _generate_composition_charts(data: ReportData, years: List[int],
+                                 specs: Dict[str, Callable]):
     """Generate asset and liability composition stacked bar charts."""
     # Asset composition as % of total assets
     asset_series = []
@@ -275,7 +281,7 @@ def _generate_composition_charts(data: ReportData, years: List[int]):
         other_a = float(yd.bs.sp01_crediti_soci) + float(yd.bs.sp08_attivita_finanziarie) + float(yd.bs.sp10_ratei_risconti_attivi)
         other_pct.append(other_a / ta * 100)
 
-    data.chart_images['composition_assets'] = charts.stacked_bar_chart(
+    specs['composition_assets'] = partial(charts.stacked_bar_chart,
         years,
         [
             {'label': 'Immobilizzazioni', 'values': fixed_pct, 'color': CHART_BLUE},
@@ -301,7 +307,7 @@ def _generate_composition_charts(data: ReportData, years: List[int]):
                    float(yd.bs.sp18_ratei_risconti_passivi))
         other_l_pct.append(other_l / tp * 100)
 
-    data.chart_images['composition_liabilities'] = charts.stacked_bar_chart(
+    specs['composition_liabilities'] = partial(charts.stacked_bar_chart,
         years,
         [
             {'label': 'Patrimonio Netto', 'values': equity_pct, 'color': CHART_BLUE},
@@ -312,14 +318,15 @@ def _generate_composition_charts(data: ReportData, years: List[int]):
         "Composizione del Passivo (%)")
 
 
-def _generate_income_charts(data: ReportData, years: List[int]):
+def _generate_income_charts(data: ReportData, years: List[int],
+                            specs: Dict[str, Callable]):
     """Generate income margin line charts."""
     revenue = [float(yd.inc.revenue) for yd in data.years]
     ebitda = [float(yd.inc.ebitda) for yd in data.years]
     ebit = [float(yd.inc.ebit) for yd in data.years]
     net_profit = [float(yd.inc.net_profit) for yd in data.years]
 
-    data.chart_images['income_margins'] = charts.line_chart(
+    specs['income_margins'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Ricavi', 'values': revenue, 'color': CHART_BLUE},
@@ -335,7 +342,7 @@ def _generate_income_charts(data: ReportData, years: List[int]):
     ebit_m = [float(yd.ratios['profitability'].ebit_margin) * 100 for yd in data.years]
     net_m = [float(yd.ratios['profitability'].net_margin) * 100 for yd in data.years]
 
-    data.chart_images['margin_pct'] = charts.line_chart(
+    specs['margin_pct'] = partial(charts.line_chart,
         years,
         [
             {'label': 'EBITDA %', 'values': ebitda_m, 'color': CHART_GREEN},
@@ -370,18 +377,19 @@ def _generate_income_charts(data: ReportData, years: List[int]):
         -prod_cost_other,
         float(latest.inc.net_profit),
     ]
-    data.chart_images['income_waterfall'] = charts.waterfall_chart(
+    specs['income_waterfall'] = partial(charts.waterfall_chart,
         waterfall_labels, waterfall_values,
         f"Da Ricavi a Utile Netto ({latest.year})")
 
 
-def _generate_structural_charts(data: ReportData, years: List[int]):
+def _generate_structural_charts(data: ReportData, years: List[int],
+                                specs: Dict[str, Callable]):
     """Generate structural analysis charts (MS, CCN, MT)."""
     ms = [float(yd.ratios['working_capital'].ms) for yd in data.years]
     ccn = [float(yd.ratios['working_capital'].ccn) for yd in data.years]
     mt = [float(yd.ratios['working_capital'].mt) for yd in data.years]
 
-    data.chart_images['structural'] = charts.line_chart(
+    specs['structural'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Margine di Struttura', 'values': ms, 'color': CHART_BLUE},
@@ -392,7 +400,8 @@ def _generate_structural_charts(data: ReportData, years: List[int]):
         ylabel="Euro", format_currency=True, y_zero_line=True)
 
 
-def _generate_ratio_charts(data: ReportData, years: List[int]):
+def _generate_ratio_charts(data: ReportData, years: List[int],
+                           specs: Dict[str, Callable]):
     """Generate line charts for each ratio category."""
     if len(years) < 2:
         return
@@ -400,7 +409,7 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
     # Liquidity
     cr = [float(yd.ratios['liquidity'].current_ratio) for yd in data.years]
     qr = [float(yd.ratios['liquidity'].quick_ratio) for yd in data.years]
-    data.chart_images['ratio_liquidity'] = charts.line_chart(
+    specs['ratio_liquidity'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Current Ratio', 'values': cr, 'color': CHART_BLUE},
@@ -411,7 +420,7 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
     # Solvency
     auto = [float(yd.ratios['solvency'].autonomy_index) * 100 for yd in data.years]
     dte = [float(yd.ratios['solvency'].debt_to_equity) for yd in data.years]
-    data.chart_images['ratio_solvency'] = charts.line_chart(
+    specs['ratio_solvency'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Autonomia Fin. %', 'values': auto, 'color': CHART_BLUE},
@@ -423,7 +432,7 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
     roi = [float(yd.ratios['profitability'].roi) * 100 for yd in data.years]
     ros = [float(yd.ratios['profitability'].ros) * 100 for yd in data.years]
     rod = [float(yd.ratios['profitability'].rod) * 100 for yd in data.years]
-    data.chart_images['ratio_profitability'] = charts.line_chart(
+    specs['ratio_profitability'] = partial(charts.line_chart,
         years,
         [
             {'label': 'ROE', 'values': roe, 'color': CHART_BLUE},
@@ -437,7 +446,7 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
     inv_d = [float(yd.ratios['activity'].inventory_turnover_days) for yd in data.years]
     recv_d = [float(yd.ratios['activity'].receivables_turnover_days) for yd in data.years]
     pay_d = [float(yd.ratios['activity'].payables_turnover_days) for yd in data.years]
-    data.chart_images['ratio_activity'] = charts.line_chart(
+    specs['ratio_activity'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Giorni Magazzino', 'values': inv_d, 'color': CHART_BLUE},
@@ -451,7 +460,7 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
             for yd in data.years]
     cov2 = [float(yd.ratios['coverage'].fixed_assets_coverage_with_equity) * 100
             for yd in data.years]
-    data.chart_images['ratio_coverage'] = charts.line_chart(
+    specs['ratio_coverage'] = partial(charts.line_chart,
         years,
         [
             {'label': '(CN+PF)/AF', 'values': cov1, 'color': CHART_BLUE},
@@ -461,13 +470,14 @@ def _generate_ratio_charts(data: ReportData, years: List[int]):
         ylabel="%", format_pct=True)
 
 
-def _generate_break_even_chart(data: ReportData, years: List[int]):
+def _generate_break_even_chart(data: ReportData, years: List[int],
+                               specs: Dict[str, Callable]):
     """Generate break-even analysis chart."""
     bep_rev = [float(yd.ratios['break_even'].break_even_revenue) for yd in data.years]
     actual_rev = [float(yd.inc.revenue) for yd in data.years]
     safety = [float(yd.ratios['break_even'].safety_margin) * 100 for yd in data.years]
 
-    data.chart_images['break_even'] = charts.line_chart(
+    specs['break_even'] = partial(charts.line_chart,
         years,
         [
             {'label': 'Ricavi Effettivi', 'values': actual_rev, 'color': CHART_BLUE},
@@ -476,13 +486,14 @@ def _generate_break_even_chart(data: ReportData, years: List[int]):
         ],
         "Break Even Point", ylabel="Euro", format_currency=True)
 
-    data.chart_images['safety_margin'] = charts.line_chart(
+    specs['safety_margin'] = partial(charts.line_chart,
         years,
         [{'label': 'Margine di Sicurezza', 'values': safety, 'color': CHART_GREEN}],
         "Margine di Sicurezza", ylabel="%", format_pct=True, y_zero_line=True)
 
 
-def _generate_cashflow_charts(data: ReportData, years: List[int]):
+def _generate_cashflow_charts(data: ReportData, years: List[int],
+                              specs: Dict[str, Callable]):
     """Generate cashflow summary charts."""
     cf_years = []
     op_cf = []
@@ -497,7 +508,7 @@ def _generate_cashflow_charts(data: ReportData, years: List[int]):
             fin_cf.append(float(yd.cashflow.financing_activities.total_financing_cashflow))
 
     if cf_years:
-        data.chart_images['cashflow_summary'] = charts.line_chart(
+        specs['cashflow_summary'] = partial(charts.line_chart,
             cf_years,
             [
                 {'label': 'Operativo', 'values': op_cf, 'color': CHART_GREEN},
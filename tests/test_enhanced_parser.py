@@ -1,29 +1,57 @@
 """
 Test Enhanced XBRL Parser with Reconciliation
 """
-from database.db import init_db, SessionLocal, drop_all
-from database.models import Company, FinancialYear
-from importers.xbrl_parser_enhanced import import_xbrl_file_enhanced
-import json
+import os
+import sys
 
+import pytest
 
-def test_enhanced_parser():
+# This is a script-style test: it wipes the database and needs the real
+# BKPS.XBRL filing in the working directory, so don't run it without one
+pytestmark = pytest.mark.skipif(
+    not os.path.exists("BKPS.XBRL"), reason="BKPS.XBRL not found in working directory"
+)
+
+# Report separators
+SEP80 = "=" * 80
+DASH76 = "-" * 76
+
+
+def test_enhanced_parser(reset=True):
     """Test enhanced XBRL parser with BKPS file"""
 
-    print("=" * 80)
-    print("ENHANCED XBRL PARSER TEST - WITH RECONCILIATION")
-    print("=" * 80)
+    # Output is buffered and written once per section rather than per line
+    out = []
+
+    def flush():
+        if out:
+            sys.stdout.write("\n".join(out) + "\n")
+            out.clear()
 
+    out.append(SEP80)
+    out.append("ENHANCED XBRL PARSER TEST - WITH RECONCILIATION")
+    out.append(SEP80)
+
+    # Imported here so collecting/importing this module stays cheap
+    from database.db import init_db, SessionLocal, drop_all
+    from database.models import Company, FinancialYear
+    from sqlalchemy.orm import selectinload
+    from importers.xbrl_parser_enhanced import import_xbrl_file_enhanced
+
+    flush()
     # Initialize database
-    print("\n1. Initializing database...")
-    drop_all()
-    init_db()
+    out.append("\n1. Initializing database...")
+    # Pass reset=False (--no-reset) to reuse an existing schema while iterating
+    if reset:
+        drop_all()
+        init_db()
 
     db = SessionLocal()
 
     try:
+        flush()
         # Import XBRL with enhanced parser
-        print("\n2. Importing BKPS.XBRL with reconciliation...")
+        out.append("\n2. Importing BKPS.XBRL with reconciliation...")
         xbrl_path = "BKPS.XBRL"
 
         result = import_xbrl_file_enhanced(
@@ -31,99 +59,114 @@ def test_enhanced_parser():
             create_company=True
         )
 
-        print(f"   ✓ Import successful!")
-        print(f"     Company: {result['company_name']} (ID: {result['company_id']})")
-        print(f"     Years imported: {result['years']}")
+        out.append(f"   ✓ Import successful!")
+        out.append(f"     Company: {result['company_name']} (ID: {result['company_id']})")
+        out.append(f"     Years imported: {result['years']}")
 
+        flush()
         # Display reconciliation info
-        print("\n3. RECONCILIATION DETAILS:")
-        print("=" * 80)
+        out.append("\n3. RECONCILIATION DETAILS:")
+        out.append(SEP80)
 
+        total_fmt = "     {:<40} €{:>15,.2f}".format
+        unmapped_fmt = "     {:<50} €{:>12,.2f}".format
         for year, recon_info in result['reconciliation_info'].items():
-            print(f"\n   Year {year}:")
-            print(f"   {'-' * 76}")
+            out.append(f"\n   Year {year}:")
+            out.append("   " + DASH76)
 
             # Show aggregate totals captured
             if recon_info['aggregate_totals']:
-                print(f"\n   Aggregate Totals Captured:")
-                for tag, value in recon_info['aggregate_totals'].items():
-                    print(f"     {tag:<40} €{value:>15,.2f}")
+                out.append(f"\n   Aggregate Totals Captured:")
+                out.extend(total_fmt(tag, value) for tag, value in recon_info['aggregate_totals'].items())
 
             # Show reconciliation adjustments
             if recon_info['reconciliation_adjustments']:
-                print(f"\n   Reconciliation Adjustments Made:")
+                out.append(f"\n   Reconciliation Adjustments Made:")
                 for category, adj in recon_info['reconciliation_adjustments'].items():
-                    print(f"\n     {category.upper()}:")
-                    print(f"       XBRL Official Total:    €{adj['xbrl_total']:>15,.2f}")
-                    print(f"       Sum of Imported Items:  €{adj['imported_sum']:>15,.2f}")
-                    print(f"       Adjustment Applied:     €{adj['adjustment']:>15,.2f}")
-                    print(f"       Added to field:         {adj['applied_to']}")
+                    out.append(f"\n     {category.upper()}:")
+                    out.append(f"       XBRL Official Total:    €{adj['xbrl_total']:>15,.2f}")
+                    out.append(f"       Sum of Imported Items:  €{adj['imported_sum']:>15,.2f}")
+                    out.append(f"       Adjustment Applied:     €{adj['adjustment']:>15,.2f}")
+                    out.append(f"       Added to field:         {adj['applied_to']}")
 
             # Show unmapped tags (if any)
             if recon_info['unmapped_tags']:
-                print(f"\n   Unmapped Tags (not imported):")
-                for unmapped in recon_info['unmapped_tags'][:10]:  # Show first 10
-                    print(f"     {unmapped['tag']:<50} €{unmapped['value']:>12,.2f}")
+                out.append(f"\n   Unmapped Tags (not imported):")
+                out.extend(unmapped_fmt(u['tag'], u['value']) for u in recon_info['unmapped_tags'][:10])  # Show first 10
                 if len(recon_info['unmapped_tags']) > 10:
-                    print(f"     ... and {len(recon_info['unmapped_tags']) - 10} more")
+                    out.append(f"     ... and {len(recon_info['unmapped_tags']) - 10} more")
 
         # Verify imported data
-        print("\n" + "=" * 80)
-        print("4. VERIFICATION - Balance Sheet Check:")
-        print("=" * 80)
+        out.append("\n" + SEP80)
+        out.append("4. VERIFICATION - Balance Sheet Check:")
+        out.append(SEP80)
 
         company_id = result['company_id']
         years = result['years']
 
+        # All imported years with their balance sheets up front, not one query per year
+        fys_by_year = {fy.year: fy for fy in db.query(FinancialYear).options(
+            selectinload(FinancialYear.balance_sheet)
+        ).filter(
+            FinancialYear.company_id == company_id,
+            FinancialYear.year.in_(years)
+        ).all()}
+
         for year in years:
-            fy = db.query(FinancialYear).filter(
-                FinancialYear.company_id == company_id,
-                FinancialYear.year == year
-            ).first()
+            fy = fys_by_year.get(year)
 
             if not fy:
-                print(f"   ❌ ERROR: Financial year {year} not found!")
+                out.append(f"   ❌ ERROR: Financial year {year} not found!")
                 continue
 
             bs = fy.balance_sheet
 
-            print(f"\n   Year {year}:")
-            print(f"     Total Assets:                  €{bs.total_assets:>15,.2f}")
-            print(f"     Total Liabilities & Equity:    €{bs.total_liabilities:>15,.2f}")
-            print(f"     {'-' * 60}")
+            out.append(f"\n   Year {year}:")
+            out.append(f"     Total Assets:                  €{bs.total_assets:>15,.2f}")
+            out.append(f"     Total Liabilities & Equity:    €{bs.total_liabilities:>15,.2f}")
+            out.append(f"     {'-' * 60}")
 
             difference = bs.total_assets - bs.total_liabilities
 
             if abs(difference) < 0.01:
-                print(f"     BALANCE CHECK:                 ✅ BALANCED!")
-                print(f"     Difference:                    €{difference:>15,.2f}")
+                out.append(f"     BALANCE CHECK:                 ✅ BALANCED!")
+                out.append(f"     Difference:                    €{difference:>15,.2f}")
             else:
-                print(f"     BALANCE CHECK:                 ❌ NOT BALANCED")
-                print(f"     Difference:                    €{difference:>15,.2f}")
-
-            print(f"\n     Breakdown:")
-            print(f"       Fixed Assets:                €{bs.fixed_assets:>15,.2f}")
-            print(f"       Current Assets:              €{bs.current_assets:>15,.2f}")
-            print(f"       Credits (short):             €{bs.sp06_crediti_breve:>15,.2f}")
-            print(f"       Credits (long):              €{bs.sp07_crediti_lungo:>15,.2f}")
-            print(f"       Cash:                        €{bs.sp09_disponibilita_liquide:>15,.2f}")
-            print()
-            print(f"       Total Equity:                €{bs.total_equity:>15,.2f}")
-            print(f"       Total Debt:                  €{bs.total_debt:>15,.2f}")
-            print(f"       Debt (short):                €{bs.sp16_debiti_breve:>15,.2f}")
-            print(f"       Debt (long):                 €{bs.sp17_debiti_lungo:>15,.2f}")
-
-        print("\n" + "=" * 80)
-        print("✅ TEST COMPLETED SUCCESSFULLY!")
-        print("=" * 80)
+                out.append(f"     BALANCE CHECK:                 ❌ NOT BALANCED")
+                out.append(f"     Difference:                    €{difference:>15,.2f}")
+
+            out.append(f"\n     Breakdown:")
+            out.append(f"       Fixed Assets:                €{bs.fixed_assets:>15,.2f}")
+            out.append(f"       Current Assets:              €{bs.current_assets:>15,.2f}")
+            out.append(f"       Credits (short):             €{bs.sp06_crediti_breve:>15,.2f}")
+            out.append(f"       Credits (long):              €{bs.sp07_crediti_lungo:>15,.2f}")
+            out.append(f"       Cash:                        €{bs.sp09_disponibilita_liquide:>15,.2f}")
+            out.append("")
+            out.append(f"       Total Equity:                €{bs.total_equity:>15,.2f}")
+            out.append(f"       Total Debt:                  €{bs.total_debt:>15,.2f}")
+            out.append(f"       Debt (short):                €{bs.sp16_debiti_breve:>15,.2f}")
+            out.append(f"       Debt (long):                 €{bs.sp17_debiti_lungo:>15,.2f}")
+
+        out.append("\n" + SEP80)
+        out.append("✅ TEST COMPLETED SUCCESSFULLY!")
+        out.append(SEP80)
 
     except Exception as e:
+        flush()
         print(f"\n❌ ERROR: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        flush()
         db.close()
 
 
 if __name__ == '__main__':
-    test_enhanced_parser()
+    import argparse
+
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--reset", dest="reset", action="store_true", default=True,
+                            help="drop and recreate all tables first (default)")
+    arg_parser.add_argument("--no-reset", dest="reset", action="store_false",
+                            help="keep the existing schema and data")
+    test_enhanced_parser(reset=arg_parser.parse_args().reset)